@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark the commit generators on synthetic contracts of growing size
+Each strategy runs in a throwaway repo; results are written as JSON
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+STRATEGIES = {
+    "legacy": ("generate_real_30_commits", []),
+    "fast-import": ("generate_real_30_commits", ["--fast-import", "--branch", "bench"]),
+    "pipeline": ("generate_real_30_commits", ["--fast-import", "--pipeline", "--branch", "bench"]),
+    "batch": ("generate_batch_commits", ["--branch", "bench", "--jobs", "2"]),
+}
+
+# The legacy loop forks git twice per definition; past this size it takes hours
+LEGACY_MAX = 1000
+
+# Put first on PATH for a run, so every git process it starts appends a byte
+# to $BENCH_GIT_LOG: pool workers, shell-wrapped commands and asyncio children
+# included, which a Popen hook in the worker process would not see
+GIT_SHIM = """#!/bin/sh
+printf . >> "$BENCH_GIT_LOG"
+exec {git} "$@"
+"""
+
+
+def synthetic_contract(size, seed=0):
+    """Build a contract with `size` top-level forms shaped like stack-mart.clar"""
+    rng = random.Random(seed)
+    out = [
+        ";; StackMart marketplace scaffold\n\n",
+        ";; SIP-009 NFT Standard Trait\n",
+        "(define-trait sip009-nft-trait\n  (\n    (get-owner (uint) (response (optional principal) uint))\n  )\n)\n\n",
+    ]
+    maps, vars_ = [], []
+    for i in range(1, size):
+        roll = rng.random()
+        if roll < 0.25:
+            out.append(f"(define-constant ERR_CODE_{i} (err u{100 + i}))\n")
+        elif roll < 0.35:
+            vars_.append(f"counter-{i}")
+            out.append(f"(define-data-var counter-{i} uint u0)\n")
+        elif roll < 0.50:
+            maps.append(f"records-{i}")
+            out.append(
+                f"\n;; Records for group {i}\n"
+                f"(define-map records-{i}\n  {{ id: uint }}\n"
+                f"  {{ owner: principal\n  , amount: uint\n  , note: (string-ascii 64) }})\n"
+            )
+        elif roll < 0.75 and maps:
+            table = rng.choice(maps)
+            out.append(
+                f"\n;; Update an entry in {table}\n"
+                f"(define-public (update-{i} (id uint) (amount uint))\n"
+                f"  (match (map-get? {table} {{ id: id }})\n    entry\n      (begin\n"
+                f"        (asserts! (is-eq tx-sender (get owner entry)) (err u{i}))\n"
+                f"        (map-set {table} {{ id: id }} (merge entry {{ amount: amount }}))\n"
+                f"        (ok true))\n    (err u404)))\n"
+            )
+        elif roll < 0.90 and maps:
+            table = rng.choice(maps)
+            out.append(
+                f"\n(define-read-only (get-{i} (id uint))\n  (map-get? {table} {{ id: id }}))\n"
+            )
+        else:
+            var = rng.choice(vars_) if vars_ else None
+            body = f"(var-set {var} (+ (var-get {var}) amount))" if var else "amount"
+            out.append(f"\n(define-private (helper-{i} (amount uint))\n  (begin {body} true))\n")
+    return "".join(out)
+
+
+def make_repo(path, size):
+    """Create a throwaway repo holding a synthetic contract and a small spec"""
+    os.makedirs(os.path.join(path, "contracts"))
+    os.makedirs(os.path.join(path, "tests"))
+    with open(os.path.join(path, "contracts", "stack-mart.clar"), "w") as f:
+        f.write(synthetic_contract(size))
+    with open(os.path.join(path, "tests", "stack-mart.spec.ts"), "w") as f:
+        f.write("import { describe, it } from 'vitest';\n\ndescribe('stack-mart', () => {});\n")
+    for cmd in (
+        ["git", "init", "-q", "-b", "main"],
+        ["git", "config", "user.name", "bench"],
+        ["git", "config", "user.email", "bench@example.com"],
+        ["git", "add", "-A"],
+        ["git", "commit", "-q", "-m", "chore: synthetic contract"],
+    ):
+        subprocess.run(cmd, cwd=path, check=True, stdout=subprocess.DEVNULL)
+
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return total
+
+
+def read_io():
+    """wchar/write_bytes for this process, including reaped children (Linux only)"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["wchar"]), int(fields["write_bytes"])
+    except OSError:
+        return None, None
+
+
+def git_shim(directory, log_path):
+    """Write a counting git wrapper into directory; returns the environment that puts it on PATH"""
+    real_git = shutil.which("git")
+    os.makedirs(directory)
+    shim = os.path.join(directory, "git")
+    with open(shim, "w") as f:
+        f.write(GIT_SHIM.format(git=real_git))
+    os.chmod(shim, 0o755)
+    open(log_path, "w").close()
+    return dict(os.environ, PATH=directory + os.pathsep + os.environ.get("PATH", ""), BENCH_GIT_LOG=log_path)
+
+
+def worker(strategy, repo, result_path):
+    """Run one strategy inside repo and record what it cost"""
+    module_name, argv = STRATEGIES[strategy]
+    sys.path.insert(0, ROOT)
+    os.chdir(repo)
+
+    module = __import__(module_name)
+    sys.argv = [module_name] + argv
+    module.main()
+
+    wchar, write_bytes = read_io()
+    with open(result_path, "w") as f:
+        json.dump({
+            "bytes_written": wchar,
+            "disk_bytes_written": write_bytes,
+            "peak_rss_kb": max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            ),
+        }, f)
+
+
+def run_case(strategy, size):
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = os.path.join(tmp, "repo")
+        make_repo(repo, size)
+        base_size = dir_size(os.path.join(repo, ".git"))
+        result_path = os.path.join(tmp, "result.json")
+        git_log = os.path.join(tmp, "git.log")
+        env = git_shim(os.path.join(tmp, "bin"), git_log)
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", strategy, repo, result_path],
+            check=True, stdout=subprocess.DEVNULL, env=env
+        )
+        wall = time.perf_counter() - started
+        with open(result_path) as f:
+            result = json.load(f)
+        # Every git process of the run; the shells and pool workers around them are not counted
+        result["git_processes"] = os.path.getsize(git_log)
+        commits = subprocess.run(
+            ["git", "rev-list", "--count", "--all"], cwd=repo, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        result.update({
+            "strategy": strategy,
+            "size": size,
+            "wall_s": round(wall, 3),
+            "commits": int(commits) - 1,
+            "repo_bytes": dir_size(os.path.join(repo, ".git")) - base_size,
+        })
+        return result
+
+
+def compare(previous_path, results):
+    """Print wall-time and RSS ratios against an earlier results file"""
+    with open(previous_path) as f:
+        previous = {(r["strategy"], r["size"]): r for r in json.load(f)["results"]}
+    for result in results:
+        old = previous.get((result["strategy"], result["size"]))
+        if old:
+            print(f"  {result['strategy']:>12} {result['size']:>6}: "
+                  f"wall x{result['wall_s'] / max(old['wall_s'], 1e-9):.2f}, "
+                  f"rss x{result['peak_rss_kb'] / max(old['peak_rss_kb'], 1):.2f}")
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "--worker":
+        worker(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark commit generator strategies")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated definition counts")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="comma-separated strategies")
+    parser.add_argument("--legacy-max", type=int, default=LEGACY_MAX,
+                        help="skip the legacy strategy above this many definitions")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="PREVIOUS_JSON", help="print ratios against an earlier run")
+    args = parser.parse_args()
+
+    revision = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+    ).stdout.strip()
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        for strategy in args.strategies.split(","):
+            if strategy == "legacy" and size > args.legacy_max:
+                print(f"⏭️  {strategy} @ {size}: skipped (above --legacy-max)")
+                continue
+            result = run_case(strategy, size)
+            results.append(result)
+            print(f"⏱️  {strategy} @ {size}: {result['wall_s']}s, {result['git_processes']} git processes, "
+                  f"{result['peak_rss_kb']} KB peak RSS, {result['repo_bytes']} repo bytes")
+
+    with open(args.output, "w") as f:
+        json.dump({"revision": revision, "python": sys.version.split()[0], "results": results}, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Top-level scanner for Clarity contracts
+Finds every top-level (define-* ...) form in one pass over the file bytes
+"""
+
+import mmap
+import re
+from collections import namedtuple
+
+# kind: "define-public", "define-map", ...; name: the defined symbol
+# start: offset of the opening paren; end: offset where the next definition
+# starts (or EOF), so trailing comments stay with the definition before them
+Definition = namedtuple("Definition", ["kind", "name", "start", "end"])
+
+# Only these characters can change the scanner state
+SPECIAL = re.compile(rb'[()";]')
+STRING_TAIL = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+TOKEN = re.compile(rb'[^\s()";]+')
+SPACE = re.compile(rb'\s*')
+NEWLINE = re.compile(rb'\n')
+# Strings and comments are matched whole so their contents never look like code
+CODE_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|;[^\n]*|[()]|[^\s()";]+', re.DOTALL)
+
+
+def open_contract(path):
+    """Map a contract file read-only and return a memoryview over it"""
+    with open(path, "rb") as f:
+        try:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:
+            # Empty files cannot be mapped
+            return memoryview(b"")
+
+
+def _definition_head(buf, pos):
+    """Return (kind, name) for a form opening at pos, or None if it is not a define"""
+    token = TOKEN.match(buf, pos + 1)
+    if not token or not token.group().startswith(b"define-"):
+        return None
+    at = SPACE.match(buf, token.end()).end()
+    if at < len(buf) and buf[at:at + 1] == b"(":
+        # (define-public (name args...) ...)
+        at = SPACE.match(buf, at + 1).end()
+    name = TOKEN.match(buf, at)
+    return token.group().decode(), name.group().decode() if name else ""
+
+
+def scan_definitions(buf):
+    """Return a Definition for every top-level define form in buf
+
+    Parens inside strings and comments are ignored, so a "(define-" at
+    column 0 inside a multi-line string does not start a new definition.
+    Raises ValueError if a string never terminates.
+    """
+    size = len(buf)
+    depth = 0
+    starts = []
+    pos = 0
+    while True:
+        match = SPECIAL.search(buf, pos)
+        if not match:
+            break
+        pos = match.start()
+        char = buf[pos]
+        if char == 0x28:  # (
+            if depth == 0:
+                head = _definition_head(buf, pos)
+                if head:
+                    starts.append((head, pos))
+            depth += 1
+            pos += 1
+        elif char == 0x29:  # )
+            depth = max(depth - 1, 0)
+            pos += 1
+        elif char == 0x22:  # "
+            tail = STRING_TAIL.match(buf, pos + 1)
+            if not tail:
+                raise ValueError(f"unterminated string at offset {pos}")
+            pos = tail.end()
+        else:  # ; comment runs to end of line
+            newline = NEWLINE.search(buf, pos)
+            pos = newline.end() if newline else size
+    definitions = []
+    for i, ((kind, name), start) in enumerate(starts):
+        end = starts[i + 1][1] if i + 1 < len(starts) else size
+        definitions.append(Definition(kind, name, start, end))
+    return definitions
+
+
+def iter_code_tokens(buf, start=0, end=None):
+    """Yield (offset, token) for every symbol or literal outside strings and comments"""
+    end = len(buf) if end is None else end
+    for match in CODE_TOKEN.finditer(buf, start, end):
+        first = buf[match.start()]
+        if first in (0x22, 0x3B, 0x28, 0x29):  # " ; ( )
+            continue
+        yield match.start(), match.group()
+
+
+def header_end(definitions, size):
+    """Offset where the first definition starts (everything before is header)"""
+    return definitions[0].start if definitions else size
+
+
+def iter_prefixes(buf, definitions):
+    """Yield (definition, prefix) where prefix is a zero-copy slice up to its end"""
+    view = memoryview(buf)
+    for definition in definitions:
+        yield definition, view[:definition.end]
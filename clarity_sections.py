@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Section-boundary index for Clarity contracts
+Finds ;; banners and (define-* forms in one line scan and caches the result
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+
+# kind: "section" for a standalone banner, else the define kind
+# name: the defined symbol ("" for banners); title: text of the leading ;; comment
+# start/end: 0-based line range, end exclusive, running up to the next boundary
+Boundary = namedtuple("Boundary", ["kind", "name", "title", "start", "end"])
+
+DEFINE = re.compile(r'\((define-[a-z-]+)\s+\(?\s*([^\s()]+)')
+# The kind alone, and a name starting a line, for forms split across lines
+KIND = re.compile(r'\((define-[a-z-]*)')
+NAME = re.compile(r'\s*\(?\s*([^\s();]+)')
+CACHE_SUFFIX = ".sections.json"
+
+
+def build_boundaries(lines):
+    """Return one Boundary per column-0 define form or standalone ;; banner
+
+    Works line by line on column-0 forms, so it still finds the boundaries
+    of a file whose parens do not balance.
+    """
+    found = []
+    comment_start = None
+    for number, line in enumerate(lines):
+        if line.startswith(";;"):
+            if comment_start is None:
+                comment_start = number
+            continue
+        if line.startswith("(define-"):
+            kind, name = _define(lines, number)
+            start = number if comment_start is None else comment_start
+            title = _title(lines, comment_start, number)
+            found.append([kind, name, title, start])
+        elif not line.strip() and comment_start is not None:
+            # A comment block followed by a blank line is a section banner
+            found.append(["section", "", _title(lines, comment_start, number), comment_start])
+        comment_start = None
+
+    boundaries = []
+    for i, (kind, name, title, start) in enumerate(found):
+        end = found[i + 1][3] if i + 1 < len(found) else len(lines)
+        boundaries.append(Boundary(kind, name, title, start, end))
+    return boundaries
+
+
+def _define(lines, number):
+    """(kind, name) of the define form starting on line number
+
+    The name may sit on the next non-blank line, as in `(define-map\n
+    listings ...)`; a form whose name cannot be found gets "".
+    """
+    match = DEFINE.match(lines[number])
+    if match:
+        return match.group(1), match.group(2)
+    kind = KIND.match(lines[number]).group(1)
+    if lines[number][len(kind) + 1:].strip():
+        return kind, ""
+    for following in range(number + 1, len(lines)):
+        if lines[following].strip():
+            match = NAME.match(lines[following])
+            return kind, match.group(1) if match else ""
+    return kind, ""
+
+
+def _title(lines, start, end):
+    if start is None:
+        return ""
+    return lines[start][2:].strip() if start < end else ""
+
+
+def load_boundaries(path):
+    """Return (lines, boundaries) for path, reusing the cached index when the content matches"""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    lines = data.decode().splitlines(keepends=True)
+    cache_path = path + CACHE_SUFFIX
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get("sha256") == digest:
+            return lines, [Boundary(*b) for b in cached["boundaries"]]
+    boundaries = build_boundaries(lines)
+    with open(cache_path, "w") as f:
+        json.dump({"sha256": digest, "boundaries": boundaries}, f)
+    return lines, boundaries
+
+
+def find_boundary(boundaries, anchor):
+    """Index of the boundary whose name or banner title is anchor"""
+    for i, boundary in enumerate(boundaries):
+        if anchor in (boundary.name, boundary.title):
+            return i
+    raise KeyError(f"no section or definition named {anchor!r}")
+
+
+def section_ranges(boundaries, anchors, total_lines):
+    """Turn anchors (None for the file start) into consecutive (start, end) line ranges"""
+    starts = [0 if anchor is None else boundaries[find_boundary(boundaries, anchor)].start
+              for anchor in anchors]
+    if starts != sorted(starts):
+        raise ValueError("section anchors are out of file order")
+    return list(zip(starts, starts[1:] + [total_lines]))
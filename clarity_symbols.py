@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Symbol index for a Clarity contract
+Records every defined name, its kind and the contract names it references
+"""
+
+from collections import namedtuple
+
+from clarity_scan import iter_code_tokens, scan_definitions
+
+# references: names of other definitions in the same contract used by this one
+Symbol = namedtuple("Symbol", ["kind", "name", "start", "end", "references"])
+
+FUNCTION_KINDS = ("define-public", "define-read-only", "define-private")
+
+
+class SymbolIndex:
+    """Built once per contract from a single token pass over its definitions"""
+
+    def __init__(self, buf, definitions=None):
+        definitions = scan_definitions(buf) if definitions is None else definitions
+        names = {d.name for d in definitions}
+        tokens = [set() for _ in definitions]
+        if definitions:
+            current = 0
+            for offset, token in iter_code_tokens(buf, definitions[0].start):
+                while offset >= definitions[current].end:
+                    current += 1
+                tokens[current].add(token)
+        encoded = {name.encode(): name for name in names}
+        self.symbols = []
+        for definition, seen in zip(definitions, tokens):
+            references = {encoded[t] for t in seen if t in encoded} - {definition.name}
+            self.symbols.append(Symbol(*definition, frozenset(references)))
+        self.by_name = {symbol.name: symbol for symbol in self.symbols}
+        self.used_by = {name: set() for name in names}
+        for symbol in self.symbols:
+            for name in symbol.references:
+                self.used_by[name].add(symbol.name)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def kind(self, name):
+        return self.by_name[name].kind
+
+    def references(self, name, kind=None):
+        """Names referenced by `name`, optionally only those of one kind"""
+        refs = self.by_name[name].references
+        return sorted(r for r in refs if kind is None or self.by_name[r].kind == kind)
+
+    def helpers(self, name):
+        """Private functions `name` calls"""
+        return self.references(name, "define-private")
+
+    def message(self, position):
+        """Commit message for the definition at `position`"""
+        symbol = self.symbols[position]
+        kind, name = symbol.kind, symbol.name
+        if kind == "define-trait":
+            subject = f"feat: add {name} trait definition"
+        elif kind == "define-map":
+            subject = f"feat: add {name} map structure"
+        elif kind == "define-public":
+            subject = f"feat: implement {name} public function"
+        elif kind == "define-read-only":
+            subject = f"feat: add {name} read-only helper"
+        elif kind == "define-private":
+            subject = f"feat: add {name} private helper"
+        elif kind == "define-data-var":
+            subject = f"feat: add {name} state variable"
+        elif kind == "define-constant":
+            subject = f"feat: add {name} {'error code' if name.startswith('ERR') else 'constant'}"
+        elif kind == "define-fungible-token":
+            subject = f"feat: add {name} fungible token"
+        elif kind == "define-non-fungible-token":
+            subject = f"feat: add {name} non-fungible token"
+        else:
+            subject = "feat: update contract logic"
+
+        if kind not in FUNCTION_KINDS:
+            return subject
+        body = []
+        for state_kind, label in (("define-map", "Maps"), ("define-data-var", "Data vars"),
+                                  ("define-private", "Helpers")):
+            used = self.references(name, state_kind)
+            if used:
+                body.append(f"- {label}: {', '.join(used)}")
+        return subject + ("\n\n" + "\n".join(body) if body else "")
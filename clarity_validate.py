@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Incremental well-formedness check for Clarity contract prefixes
+Carries paren depth, string/comment state and defined names from one prefix to the next
+"""
+
+import re
+from collections import namedtuple
+
+# kind: "unmatched-paren", "unclosed-form", "unterminated-string" or "undefined-name"
+# offset: byte offset in the full contract where the problem starts
+Problem = namedtuple("Problem", ["kind", "offset", "detail"])
+
+# Unterminated strings and comments match up to the end of the chunk so they can be carried
+LEXEME = re.compile(rb'"(?:[^"\\]|\\.)*(?:(?P<close>")|\\?\Z)|;[^\n]*(?:\n|\Z)|[()]|[^\s()";]+', re.DOTALL)
+
+
+class PrefixValidator:
+    """Check successive prefixes of one contract, scanning only what each adds
+
+    Feed the bytes appended since the previous prefix; every feed() returns
+    the problems of the prefix seen so far. The whole series costs one pass
+    over the final contract, however many prefixes it is cut into.
+    """
+
+    def __init__(self, contract_names):
+        # Only names the full contract defines count as references, which
+        # leaves out builtins and tuple keys; a local that shares a
+        # contract name is caught through `locals` below
+        self.contract_names = {name.encode() for name in contract_names}
+        self.defined = set()
+        # Names bound by the current top-level form's argument list and let
+        # bindings; they shadow contract names until the form closes
+        self.locals = set()
+        # One [head symbol, arguments after it, role] per open paren, where
+        # role is "signature", "bindings", "binder" (its head is a local) or None
+        self.frames = []
+        self.pending = {}
+        self.errors = []
+        self.depth = 0
+        self.open_at = []
+        self.head = None
+        self.carry = b""
+        self.offset = 0
+
+    def feed(self, delta):
+        chunk = self.carry + bytes(delta)
+        chunk_start = self.offset - len(self.carry)
+        self.offset += len(delta)
+        self.carry = b""
+        for match in LEXEME.finditer(chunk):
+            lexeme = match.group()
+            if match.end() == len(chunk) and _incomplete(match):
+                # Finish this string, comment or symbol once the next delta arrives
+                self.carry = lexeme
+                break
+            self._lexeme(lexeme, chunk_start + match.start())
+        return self.problems()
+
+    def _lexeme(self, lexeme, offset):
+        first = lexeme[:1]
+        if first in (b'"', b";"):
+            return
+        if first == b"(":
+            if self.depth == 0:
+                self.head = "kind"
+            elif not (self.head == "name" and self.depth == 1):
+                # Only (define-public (name args) ...) opens a paren before the name
+                self.head = None
+            self._open()
+            self.depth += 1
+            self.open_at.append(offset)
+        elif first == b")":
+            if self.depth == 0:
+                self.errors.append(Problem("unmatched-paren", offset, "')' closes nothing"))
+                return
+            self.depth -= 1
+            self.open_at.pop()
+            self.head = None
+            self._close()
+        elif self._binds(lexeme):
+            self.locals.add(lexeme)
+        elif self.head == "kind":
+            self.head = "name" if lexeme.startswith(b"define-") else None
+        elif self.head == "name":
+            self.head = None
+            self.defined.add(lexeme)
+            self.pending.pop(lexeme, None)
+        elif lexeme in self.contract_names and lexeme not in self.defined and lexeme not in self.locals:
+            self.pending.setdefault(lexeme, offset)
+
+    def _open(self):
+        parent = self.frames[-1] if self.frames else None
+        role = None
+        if self.depth == 1 and self.head == "name":
+            role = "signature"
+        elif parent is not None and parent[2] in ("signature", "bindings"):
+            # (define-public (name (arg type) ...)) and (let ((name value) ...) ...)
+            role = "binder"
+        elif parent is not None and parent[0] == b"let" and parent[1] == 0:
+            role = "bindings"
+        self.frames.append([None, 0, role])
+
+    def _close(self):
+        self.frames.pop()
+        if not self.frames:
+            self.locals.clear()
+        elif self.frames[-1][0] is None:
+            self.frames[-1][0] = b""
+        else:
+            self.frames[-1][1] += 1
+
+    def _binds(self, symbol):
+        """Record symbol in its form; True when it is a name being bound"""
+        if not self.frames:
+            return False
+        frame = self.frames[-1]
+        if frame[0] is not None:
+            frame[1] += 1
+            return False
+        frame[0] = symbol
+        return frame[2] == "binder"
+
+    def problems(self):
+        """Problems in the prefix fed so far, as if it ended the file"""
+        found = list(self.errors)
+        pending = dict(self.pending)
+        if self.carry[:1] == b'"':
+            found.append(Problem("unterminated-string", self.offset - len(self.carry), "string never closes"))
+        elif self.carry and self.carry[:1] != b";" and self.head is None:
+            if self.carry in self.contract_names and self.carry not in self.defined | self.locals:
+                pending.setdefault(self.carry, self.offset - len(self.carry))
+        if self.depth:
+            # Later definitions look nested inside the open form, so every
+            # name they define would show up as undefined; report the cause only
+            found.append(Problem("unclosed-form", self.open_at[0], "'(' is never closed"))
+            return found
+        for name, offset in sorted(pending.items(), key=lambda item: item[1]):
+            found.append(Problem("undefined-name", offset, f"{name.decode()} is used before it is defined"))
+        return found
+
+
+def _incomplete(match):
+    first = match.group()[:1]
+    if first == b'"':
+        return match.group("close") is None
+    if first == b";":
+        return not match.group().endswith(b"\n")
+    # A symbol at the end of a chunk may continue in the next one
+    return first not in (b"(", b")")
+
+
+def line_of(buf, offset):
+    return bytes(buf[:offset]).count(b"\n") + 1
+
+
+def validate_prefixes(buf, ends, names):
+    """Return [(step, Problem)] for each prefix buf[:end] in ends that is not well formed
+
+    ends must be non-decreasing. A problem is reported once, at the first
+    step where it appears, even if later steps still have it.
+    """
+    validator = PrefixValidator(names)
+    view = memoryview(buf)
+    found = []
+    seen = set()
+    start = 0
+    for step, end in enumerate(ends):
+        for problem in validator.feed(view[start:end]):
+            if problem not in seen:
+                seen.add(problem)
+                found.append((step, problem))
+        start = end
+    return found
+
+
+def check_prefixes(buf, ends, names, messages):
+    """Validate the prefix behind each message; return one printable line per problem"""
+    return [
+        f"❌ {messages[step].splitlines()[0]}: {problem.kind} at line {line_of(buf, problem.offset)} "
+        f"({problem.detail})"
+        for step, problem in validate_prefixes(buf, ends, names)
+    ]
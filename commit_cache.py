@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generated commits
+Lets a re-run reuse the unchanged leading part of a generated history
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from collections import OrderedDict
+
+from fast_import import FastImportStream, git_output
+from gen_trace import count, phase
+
+CACHE_FILE = "commitgen-cache.json"
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def blob_id(data):
+    """Git blob id of data, computed without touching the object store"""
+    count("bytes_hashed", len(data))
+    digest = hashlib.sha1(b"blob %d\0" % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def step_key(previous_key, message, path, blob):
+    """Chain a step onto the key of everything before it"""
+    return hashlib.sha1(f"{previous_key}\0{message}\0{path}\0{blob}".encode()).hexdigest()
+
+
+def step_changes(path, data):
+    """A step's {path: data}; a step changing several files passes that dict as its path"""
+    return path if isinstance(path, dict) else {path: data}
+
+
+def step_blobs(path, data):
+    """Blob id of every file a step writes; data may already be a blob id"""
+    return {p: d if isinstance(d, str) else blob_id(d) for p, d in step_changes(path, data).items()}
+
+
+def changes_key(previous_key, message, blobs):
+    """step_key over each file of a step; a one-file step keeps its plain step_key"""
+    key = previous_key
+    for path, blob in sorted(blobs.items()):
+        key = step_key(key, message, path, blob)
+    return key
+
+
+def _trim(ordered, limit):
+    """Drop the least recently used items of an OrderedDict beyond limit"""
+    while len(ordered) > limit:
+        ordered.popitem(last=False)
+
+
+class CommitCache:
+    """LRU map from step key to the blob, tree and commit ids it produced
+
+    `bases` remembers which base commit each generated tip was built on,
+    so re-running onto a generated branch rebuilds from the same base.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.bases = OrderedDict()
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.entries.update(data.get("entries", {}))
+            self.bases.update(data.get("bases", {}))
+
+    @classmethod
+    def load(cls, max_entries=DEFAULT_MAX_ENTRIES, cwd=None):
+        git_dir = git_output(["rev-parse", "--absolute-git-dir"], cwd=cwd)
+        return cls(os.path.join(git_dir, CACHE_FILE), max_entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        _trim(self.entries, self.max_entries)
+
+    def remember_tip(self, tip, base):
+        self.bases[tip] = base
+        self.bases.move_to_end(tip)
+        _trim(self.bases, self.max_entries)
+
+    def base_for(self, commit):
+        """Base a generated tip was built on, or commit itself if it was not generated"""
+        return self.bases.get(commit, commit)
+
+    def save(self):
+        # A smaller --cache-size, or a run that only hit, still writes at most max_entries
+        _trim(self.entries, self.max_entries)
+        _trim(self.bases, self.max_entries)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries, "bases": self.bases}, f)
+        os.replace(tmp, self.path)
+
+
+def commit_exists(commit, cwd=None):
+    return subprocess.run(["git", "cat-file", "-e", f"{commit}^{{commit}}"], cwd=cwd).returncode == 0
+
+
+def import_series(cache, branch, base, steps, cwd=None):
+    """Commit steps onto branch starting at base, reusing cached commits
+
+    steps is a sequence of (message, path, data) where data is the file
+    content (bytes-like) or an existing blob id; a step writing several
+    files is (message, {path: data}, None). Only the steps after the
+    longest cached prefix are sent to fast-import. Returns (reused, imported).
+    """
+    keys = []
+    hits = 0
+    key = base or ""
+    for message, path, data in steps:
+        blobs = step_blobs(path, data)
+        key = changes_key(key, message, blobs)
+        keys.append((key, blobs))
+        if hits == len(keys) - 1 and key in cache.entries:
+            hits += 1
+
+    # The cache can outlive the objects (gc, a deleted branch); start over then
+    with phase("verify"):
+        if hits and not commit_exists(cache.get(keys[hits - 1][0])["commit"], cwd=cwd):
+            hits = 0
+    for key, _ in keys[:hits]:
+        cache.get(key)
+
+    start = cache.get(keys[hits - 1][0])["commit"] if hits else base
+    with phase("commit", steps=len(keys) - hits):
+        if hits == len(keys):
+            git_output(["update-ref", f"refs/heads/{branch}", start], cwd=cwd)
+        else:
+            _import(cache, branch, start, steps[hits:], keys[hits:], cwd)
+
+    cache.remember_tip(resolve_tip(branch, cwd), base)
+    cache.save()
+    return hits, len(keys) - hits
+
+
+def _import(cache, branch, start, steps, keys, cwd):
+    """Send the uncached steps through fast-import and record what they produced"""
+    with tempfile.TemporaryDirectory() as tmp:
+        marks_path = os.path.join(tmp, "marks")
+        commit_marks = []
+        with FastImportStream(branch, parent=start, cwd=cwd, export_marks=marks_path, force=True) as stream:
+            for message, path, data in steps:
+                files = {p: d if isinstance(d, str) else stream.blob(d) for p, d in step_changes(path, data).items()}
+                commit_marks.append(stream.commit(message, files))
+        marks = FastImportStream.read_marks(marks_path)
+
+    record_commits(cache, branch, keys, [marks[mark] for mark in commit_marks], cwd)
+
+
+def record_commits(cache, branch, keys, commits, cwd=None):
+    """Cache the commits just written to branch under their step keys"""
+    trees = dict(
+        line.split() for line in git_output(
+            ["log", "--format=%H %T", f"-{len(commits)}", f"refs/heads/{branch}"], cwd=cwd
+        ).splitlines()
+    )
+    for (key, blobs), commit in zip(keys, commits):
+        blob = next(iter(blobs.values())) if len(blobs) == 1 else blobs
+        cache.put(key, {"blob": blob, "tree": trees[commit], "commit": commit})
+
+
+def resolve_tip(branch, cwd=None):
+    return git_output(["rev-parse", f"refs/heads/{branch}"], cwd=cwd)
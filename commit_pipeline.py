@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Asyncio pipeline that overlaps chunking, hashing and committing
+Prefixes are produced lazily and flow through bounded queues into fast-import
+"""
+
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from commit_cache import changes_key, record_commits, step_blobs, step_changes
+from fast_import import FastImportStream, git_output
+from gen_trace import phase
+from git_session import GitSession
+
+DEFAULT_DEPTH = 8
+DONE = None
+
+
+async def _produce(steps, queue, pool):
+    """Pull steps lazily and start hashing each one as soon as it is queued"""
+    loop = asyncio.get_running_loop()
+    for message, path, data in steps:
+        # hashlib releases the GIL on large buffers, so hashes run on all cores
+        hashed = loop.run_in_executor(pool, step_blobs, path, data)
+        await queue.put((message, path, data, hashed))
+    await queue.put(DONE)
+
+
+async def _write(queue, cache, branch, base, cwd):
+    """Commit queued steps in order, starting fast-import at the first cache miss"""
+    key = base or ""
+    start = base
+    stream = proc = None
+    reused = 0
+    keys, commit_marks = [], []
+    with tempfile.TemporaryDirectory() as tmp, GitSession(cwd=cwd) as session:
+        marks_path = os.path.join(tmp, "marks")
+        while (item := await queue.get()) is not DONE:
+            message, path, data, hashed = item
+            blobs = await hashed
+            key = changes_key(key, message, blobs)
+            if stream is None:
+                entry = cache.get(key)
+                # cat-file --batch answers existence checks without a fork per step
+                if entry is not None and session.cat_file(entry["commit"]) is not None:
+                    start = entry["commit"]
+                    reused += 1
+                    continue
+                proc = await asyncio.create_subprocess_exec(
+                    *FastImportStream.command(marks_path, force=True), cwd=cwd, stdin=asyncio.subprocess.PIPE
+                )
+                stream = FastImportStream(branch, parent=start, cwd=cwd, proc=proc)
+            keys.append((key, blobs))
+            files = {p: d if isinstance(d, str) else stream.blob(d) for p, d in step_changes(path, data).items()}
+            commit_marks.append(stream.commit(message, files))
+            # Backpressure: wait while fast-import catches up instead of buffering
+            await proc.stdin.drain()
+
+        if stream is None:
+            git_output(["update-ref", f"refs/heads/{branch}", start], cwd=cwd)
+            return reused, 0
+        stream.end()
+        proc.stdin.close()
+        if await proc.wait() != 0:
+            raise RuntimeError(f"git fast-import exited with {proc.returncode}")
+        marks = FastImportStream.read_marks(marks_path)
+
+    record_commits(cache, branch, keys, [marks[mark] for mark in commit_marks], cwd)
+    return reused, len(keys)
+
+
+async def _run(cache, branch, base, steps, workers, depth, cwd):
+    queue = asyncio.Queue(maxsize=depth)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        producer = asyncio.create_task(_produce(steps, queue, pool))
+        try:
+            result = await _write(queue, cache, branch, base, cwd)
+        finally:
+            producer.cancel()
+    return result
+
+
+def pipeline_import(cache, branch, base, steps, workers=None, depth=DEFAULT_DEPTH, cwd=None):
+    """Pipelined equivalent of commit_cache.import_series
+
+    steps may be any iterable (a generator keeps memory bounded); at most
+    `depth` steps are in flight between producing, hashing and committing.
+    Returns (reused, imported).
+    """
+    with phase("commit", pipeline=True):
+        reused, imported = asyncio.run(_run(cache, branch, base, steps, workers or os.cpu_count(), depth, cwd))
+    tip = git_output(["rev-parse", f"refs/heads/{branch}"], cwd=cwd)
+    cache.remember_tip(tip, base)
+    cache.save()
+    return reused, imported
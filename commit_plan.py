@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Compile a generated commit series once into a plan file, then apply it
+`plan` analyzes the contracts or the working-tree diff; `apply` replays the result
+"""
+
+import argparse
+import json
+import os
+import subprocess
+
+from clarity_scan import header_end, open_contract, scan_definitions
+from clarity_sections import build_boundaries, load_boundaries, section_ranges
+from clarity_validate import check_prefixes
+from commit_cache import CommitCache, blob_id, import_series
+from commit_schedule import commit_count
+from fast_import import current_branch, git_output, resolve_commit
+from gen_trace import add_trace_arguments, enable_from_args, phase
+from git_session import GitSession, isolated_index
+from spec_index import join_ranges
+
+PLAN_VERSION = 1
+DEFAULT_PLAN = "commit-plan.json"
+
+# A plan is {"version", "kind", "base", "sources", "steps"}:
+# - prefix kinds (definitions, sections, contracts): each step is
+#   [message, path, source, end] and commits source[:end] as path, or
+#   [message, [[path, source, cut], ...]] for a step writing several files,
+#   where cut is an end offset or a list of [start, end] byte ranges; sources
+#   maps each source file to its blob id so apply can refuse stale inputs
+# - diff: each step is [message, {path: [blob id, size, mode] or null}] on
+#   top of base; the blobs are written to this repository's object store by plan
+PREFIX_KINDS = ("definitions", "sections", "contracts")
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def step_files(step):
+    """[(path, source, cut)] of a prefix step"""
+    return step[1] if len(step) == 2 else [step[1:]]
+
+
+def cut_size(cut):
+    return cut if isinstance(cut, int) else sum(end - start for start, end in cut)
+
+
+def cut_data(buf, cut):
+    return buf[:cut] if isinstance(cut, int) else join_ranges(buf, cut)
+
+
+def plan_definitions(commits=None, by="bytes"):
+    """Steps for stack-mart.clar as generate_real_30_commits.py commits them
+
+    One per definition, or with commits, that many groups of balanced size.
+    """
+    from generate_real_30_commits import CONTRACT_PATH, TEST_PATH, plan_series
+
+    content = open_contract(CONTRACT_PATH)
+    _, messages, ends, cuts, placed, blocks = plan_series(content, _read(TEST_PATH), commits, by)
+    steps = []
+    for i, (message, end) in enumerate(zip(messages, ends)):
+        if i in cuts:
+            steps.append([message, [[CONTRACT_PATH, CONTRACT_PATH, end],
+                                    [TEST_PATH, TEST_PATH, [list(r) for r in cuts[i]]]]])
+        else:
+            steps.append([message, CONTRACT_PATH, CONTRACT_PATH, end])
+    if placed:
+        test_changed = placed < blocks
+    else:
+        test_changed = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", TEST_PATH]).returncode != 0
+    if test_changed:
+        steps.append(["test: add comprehensive test suite including like system", TEST_PATH, TEST_PATH,
+                      os.path.getsize(TEST_PATH)])
+    return steps
+
+
+def plan_sections():
+    """One step per SECTIONS entry of generate_granular_commits.py, with the spec blocks it makes runnable"""
+    from generate_granular_commits import (SECTIONS, SOURCE_PATH, TEST_MESSAGE, TEST_PATH, TEST_SOURCE_PATH,
+                                           section_ends, section_spec_cuts, test_step_needed)
+
+    lines, boundaries = load_boundaries(SOURCE_PATH)
+    ranges = section_ranges(boundaries, [anchor for anchor, _ in SECTIONS], len(lines))
+    test_source = TEST_SOURCE_PATH if os.path.exists(TEST_SOURCE_PATH) else TEST_PATH
+    test_data = _read(test_source) if os.path.exists(test_source) else None
+    cuts, placed, blocks = section_spec_cuts(boundaries, ranges, test_data) if test_data else ({}, 0, 0)
+    steps = []
+    for i, ((_, msg), end) in enumerate(zip(SECTIONS, section_ends(lines, ranges))):
+        if i in cuts:
+            steps.append([msg, [["contracts/stack-mart.clar", SOURCE_PATH, end],
+                                [TEST_PATH, test_source, [list(r) for r in cuts[i]]]]])
+        else:
+            steps.append([msg, "contracts/stack-mart.clar", SOURCE_PATH, end])
+    if test_step_needed(test_data, placed, blocks):
+        steps.append([TEST_MESSAGE, TEST_PATH, test_source, len(test_data)])
+    return steps
+
+
+def plan_contracts():
+    """Every contract, one step per definition, in dependency order as generate_batch_commits.py does"""
+    from generate_batch_commits import contract_messages, contract_references, dependency_order, discover_contracts
+
+    contracts, depends_on = discover_contracts()
+    series = {}
+    for name, path in contracts.items():
+        content = open_contract(path)
+        definitions = scan_definitions(content)
+        depends_on.setdefault(name, set()).update(contract_references(name, content))
+        ends = [header_end(definitions, len(content))] + [d.end for d in definitions]
+        series[name] = [[msg, path, path, end] for msg, end in zip(contract_messages(name, content, definitions),
+                                                                   ends)]
+    return [step for name in dependency_order(list(contracts), depends_on) for step in series[name]]
+
+
+def plan_diff(session):
+    """One step per COMMITS message of generate_30_commits.py, split from the working-tree diff"""
+    from generate_30_commits import COMMITS
+    from hunk_splitter import plan_split
+
+    base, planned, modes = plan_split(COMMITS, session)
+    contents = [data for _, changes in planned for data in changes.values() if data is not None]
+    ids = iter(session.write_blobs(contents))
+    steps = []
+    for message, changes in planned:
+        if changes:
+            steps.append([message, {path: None if data is None else [next(ids), len(data), modes.get(path, "100644")]
+                                    for path, data in changes.items()}])
+    return base, steps
+
+
+def validate(steps):
+    """Print well-formedness problems of every Clarity prefix in a prefix plan"""
+    by_source = {}
+    for step in steps:
+        for _, source, end in step_files(step):
+            if source.endswith((".clar", ".clar.final")):
+                by_source.setdefault(source, []).append((step[0], end))
+    problems = []
+    for source, cuts in by_source.items():
+        data = _read(source)
+        names = {b.name for b in build_boundaries(data.decode().splitlines(keepends=True)) if b.name}
+        problems += check_prefixes(data, [end for _, end in cuts], names, [msg for msg, _ in cuts])
+    for line in problems:
+        print(line)
+    return problems
+
+
+def write_plan(path, plan):
+    """One step per line keeps the plan compact and still reviewable in a diff"""
+    header = {k: v for k, v in plan.items() if k != "steps"}
+    with open(path, "w") as f:
+        f.write(json.dumps(header)[:-1] + ', "steps": [\n')
+        f.write(",\n".join(json.dumps(step) for step in plan["steps"]))
+        f.write("\n]}\n")
+
+
+def plan_main(args):
+    with phase("split"):
+        if args.kind == "diff":
+            with GitSession() as session:
+                base, steps = plan_diff(session)
+            sources = {}
+        else:
+            base = None
+            if args.kind == "definitions":
+                steps = plan_definitions(args.commits, args.by)
+            else:
+                steps = {"sections": plan_sections, "contracts": plan_contracts}[args.kind]()
+            sources = {source: blob_id(_read(source))
+                       for source in sorted({source for step in steps for _, source, _ in step_files(step)})}
+    if args.kind in PREFIX_KINDS:
+        with phase("verify"):
+            problems = validate(steps)
+        if problems and args.strict:
+            raise SystemExit(f"{len(problems)} problems in the planned prefixes; no plan was written")
+    write_plan(args.output, {"version": PLAN_VERSION, "kind": args.kind, "base": base,
+                             "sources": sources, "steps": steps})
+    print(f"📝 Planned {len(steps)} commits ({args.kind}) in {args.output}")
+
+
+def load_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise SystemExit(f"❌ {path} is plan version {plan.get('version')}, expected {PLAN_VERSION}")
+    return plan
+
+
+def stale_sources(plan):
+    """Sources whose content no longer matches the blob id recorded in the plan"""
+    return [source for source, blob in plan["sources"].items()
+            if not os.path.exists(source) or blob_id(_read(source)) != blob]
+
+
+def step_sizes(plan):
+    if plan["kind"] == "diff":
+        return [sum(entry[1] for entry in changes.values() if entry) for _, changes in plan["steps"]]
+    return [sum(cut_size(cut) for _, _, cut in step_files(step)) for step in plan["steps"]]
+
+
+def dry_run(plan):
+    """Print per-commit and total sizes without running git"""
+    sizes = step_sizes(plan)
+    for i, (step, size) in enumerate(zip(plan["steps"], sizes)):
+        print(f"  {i:>5} {size:>10} B  {step[0].splitlines()[0]}")
+    print(f"📊 {len(sizes)} commits, {sum(sizes)} bytes sent to git, largest commit {max(sizes, default=0)} bytes")
+    stale = stale_sources(plan) if plan["kind"] in PREFIX_KINDS else []
+    for source in stale:
+        print(f"⚠️  {source} changed since the plan was made")
+
+
+def applied_before(plan, tip):
+    """Whether tip is a diff plan's base plus commits that an earlier apply of the same plan made
+
+    Steps whose tree did not change make no commit, so the commits since
+    base must carry the plan's messages in order, possibly with gaps.
+    """
+    base = plan["base"]
+    if subprocess.run(["git", "merge-base", "--is-ancestor", base, tip]).returncode != 0:
+        return False
+    count = int(git_output(["rev-list", "--first-parent", "--count", f"{base}..{tip}"]))
+    if resolve_commit(f"{tip}~{count}") != base:
+        return False
+    log = git_output(["log", "-z", "--first-parent", "--reverse", "--format=%B", f"{base}..{tip}"])
+    messages = iter(message.strip() for message, _ in plan["steps"])
+    return all(any(entry.strip() == message for message in messages) for entry in log.split("\0") if entry)
+
+
+def apply_main(args):
+    plan = load_plan(args.plan)
+    if args.dry_run:
+        dry_run(plan)
+        return
+
+    checked_out = current_branch()
+    branch = args.branch or checked_out
+    if plan["kind"] == "diff":
+        # The first commit moves the branch onto base, so anything else on it would be lost
+        tip = resolve_commit(branch)
+        if tip not in (None, plan["base"]) and not args.force and not applied_before(plan, tip):
+            raise SystemExit(f"❌ {branch} is at {tip[:12]}, not at the plan's base {plan['base'][:12]} or an "
+                             f"earlier apply of this plan; its commits would be dropped. Use --force to apply anyway")
+        with isolated_index(plan["base"]) as session:
+            commits = 0
+            for message, changes in plan["steps"]:
+                session.stage_blobs({path: entry and entry[0] for path, entry in changes.items()},
+                                    {path: entry[2] for path, entry in changes.items() if entry and len(entry) > 2})
+                if session.commit_index(message, branch):
+                    commits += 1
+        if branch == checked_out:
+            # The branch moved under the checkout; sync the shared index to its new tip
+            subprocess.run(["git", "reset", "-q"], check=True)
+        print(f"Success: Committed {commits} commits onto {branch}.")
+        return
+
+    with phase("verify"):
+        stale = stale_sources(plan)
+    if stale:
+        raise SystemExit(f"❌ {', '.join(stale)} changed since the plan was made; run plan again")
+    with phase("read"):
+        buffers = {source: open_contract(source) for source in plan["sources"]}
+    steps = []
+    for step in plan["steps"]:
+        files = {path: cut_data(buffers[source], cut) for path, source, cut in step_files(step)}
+        steps.append((step[0], files, None) if len(step) == 2 else (step[0], *files.popitem()))
+    cache = CommitCache.load()
+    base = cache.base_for(resolve_commit(branch) or resolve_commit("HEAD"))
+    reused, imported = import_series(cache, branch, base, steps)
+    print(f"Success: Reused {reused} and imported {imported} commits onto {branch}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan a generated commit series once, apply it many times")
+    add_trace_arguments(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan", help="analyze the inputs and write a plan file")
+    plan_parser.add_argument("kind", choices=PREFIX_KINDS + ("diff",),
+                             help="definitions: stack-mart.clar per definition; sections: the granular "
+                                  "section list; contracts: every contract; diff: the working-tree diff")
+    plan_parser.add_argument("-o", "--output", default=DEFAULT_PLAN, help="where to write the plan")
+    plan_parser.add_argument("--commits", type=commit_count,
+                             help="definitions: group into this many commits of balanced size")
+    plan_parser.add_argument("--by", choices=("bytes", "lines"), default="bytes", help="what --commits balances")
+    plan_parser.add_argument("--strict", action="store_true",
+                             help="refuse to write a plan whose prefixes are not well formed")
+
+    apply_parser = commands.add_parser("apply", help="commit the series a plan file describes")
+    apply_parser.add_argument("plan", nargs="?", default=DEFAULT_PLAN, help="plan file to apply")
+    apply_parser.add_argument("--branch", help="branch to commit onto (default: current branch)")
+    apply_parser.add_argument("--dry-run", action="store_true",
+                              help="print commit stats without touching git")
+    apply_parser.add_argument("--force", action="store_true",
+                              help="diff plans: apply even if the branch has moved past the plan's base")
+
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.command == "plan":
+        plan_main(args)
+    else:
+        apply_main(args)
+
+
+if __name__ == "__main__":
+    main()
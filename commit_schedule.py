@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Balanced commit scheduler for Clarity contracts
+Groups consecutive definitions into a target number of commits of even size
+"""
+
+import argparse
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from itertools import accumulate
+
+from clarity_scan import header_end, open_contract, scan_definitions
+from clarity_sections import build_boundaries
+from clarity_symbols import SymbolIndex
+
+# Items are the contract header (item 0) then every definition (item i + 1);
+# a group covers items[first:last] and size is their total bytes or lines
+Group = namedtuple("Group", ["first", "last", "size"])
+
+
+def item_sizes(buf, definitions, by="bytes"):
+    """Size of the header and of each definition, in bytes or lines"""
+    ends = [header_end(definitions, len(buf))] + [d.end for d in definitions]
+    starts = [0] + ends[:-1]
+    if by == "bytes":
+        return [end - start for start, end in zip(starts, ends)]
+    data = bytes(buf)
+    return [data.count(b"\n", start, end) for start, end in zip(starts, ends)]
+
+
+def section_cuts(buf, definitions):
+    """Item positions where a ;; banner section starts; a commit should not span them"""
+    data = bytes(buf)
+    lines = data.decode().splitlines(keepends=True)
+    line_starts = list(accumulate((len(line.encode()) for line in lines), initial=0))
+    def_lines = [bisect_right(line_starts, d.start) - 1 for d in definitions]
+    cuts = set()
+    for boundary in build_boundaries(lines):
+        if boundary.kind == "section":
+            # The first definition at or after the banner starts the section
+            position = bisect_left(def_lines, boundary.start) + 1
+            if 1 < position <= len(definitions):
+                cuts.add(position)
+    return sorted(cuts)
+
+
+def helper_glue(symbols, required):
+    """blocked[k] is True when cutting before item k would split a helper from its user
+
+    A private helper stays with its nearest user in the same section; a
+    helper used across sections is left alone, since section cuts win.
+    """
+    items = len(symbols.symbols) + 1
+    position = {symbol.name: i + 1 for i, symbol in enumerate(symbols.symbols)}
+    starts = set(required)
+    # section[p + 1] numbers the section item p is in
+    section = list(accumulate((k in starts for k in range(items)), initial=0))
+    delta = [0] * (items + 1)
+    for symbol in symbols.symbols:
+        if symbol.kind != "define-private":
+            continue
+        helper = position[symbol.name]
+        users = [position[user] for user in symbols.used_by[symbol.name]
+                 if section[position[user] + 1] == section[helper + 1]]
+        if not users:
+            continue
+        user = min(users, key=lambda p: abs(p - helper))
+        low, high = min(helper, user), max(helper, user)
+        # Cuts at low + 1 .. high fall between them
+        delta[low + 1] += 1
+        delta[high + 1] -= 1
+    return [depth > 0 for depth in accumulate(delta)]
+
+
+def partition(sizes, target, allowed, required=()):
+    """Split sizes into at most target contiguous groups, minimising the largest
+
+    allowed[k] says whether a group may start at item k; every position in
+    required starts a group. The largest group size is found by binary
+    search, each probe a greedy walk that jumps from cut to cut by bisect
+    over prefix sums, so a probe costs O(target log n).
+    """
+    n = len(sizes)
+    prefix = list(accumulate(sizes, initial=0))
+    forced = set(required)
+    cuts = [k for k in range(1, n) if allowed[k] or k in forced] + [n]
+    cut_prefix = [prefix[k] for k in cuts]
+    required = sorted(forced) + [n]
+
+    def walk(capacity):
+        groups = []
+        pos = 0
+        while pos < n:
+            if len(groups) == target:
+                return None
+            # Farthest cut within capacity, but never past the next required cut
+            reach = bisect_right(cut_prefix, prefix[pos] + capacity)
+            stop = min(cuts[reach - 1] if reach else 0, required[bisect_right(required, pos)])
+            if stop <= pos:
+                return None
+            groups.append(Group(pos, stop, prefix[stop] - prefix[pos]))
+            pos = stop
+        return groups
+
+    low, high = max(sizes, default=0), prefix[-1]
+    while low < high:
+        middle = (low + high) // 2
+        if walk(middle) is None:
+            low = middle + 1
+        else:
+            high = middle
+    return walk(low), cuts, prefix
+
+
+def split_to(groups, target, cuts, prefix):
+    """Split the largest groups at their most even inner cut until there are target groups
+
+    Splitting never makes a group larger, so the optimal largest size holds.
+    """
+    cut_prefix = [prefix[k] for k in cuts]
+    heap = [(-group.size, group.first, group) for group in groups]
+    heapq.heapify(heap)
+    done = []
+    while heap and len(heap) + len(done) < target:
+        _, _, group = heapq.heappop(heap)
+        low, high = bisect_right(cuts, group.first), bisect_left(cuts, group.last)
+        if low >= high:
+            done.append(group)
+            continue
+        middle = prefix[group.first] + group.size / 2
+        i = bisect_left(cut_prefix, middle, low, high)
+        cut = cuts[min((j for j in (i - 1, i) if low <= j < high), key=lambda j: abs(cut_prefix[j] - middle))]
+        for part in (Group(group.first, cut, prefix[cut] - prefix[group.first]),
+                     Group(cut, group.last, prefix[group.last] - prefix[cut])):
+            heapq.heappush(heap, (-part.size, part.first, part))
+    return sorted(done + [group for _, _, group in heap])
+
+
+def schedule(buf, definitions, target, by="bytes", symbols=None):
+    """Group the header and definitions into target commits of balanced size
+
+    Returns (groups, notes). Sections are honoured while target allows one
+    commit per section, and private helpers stay in the same commit as
+    their nearest caller.
+    """
+    if target < 1:
+        raise ValueError(f"cannot schedule into {target} commits; the target must be at least 1")
+    symbols = symbols or SymbolIndex(buf, definitions)
+    sizes = item_sizes(buf, definitions, by)
+    required = section_cuts(buf, definitions)
+    notes = []
+    if len(required) + 1 > target:
+        notes.append(f"{len(required) + 1} sections do not fit in {target} commits; section boundaries are soft")
+        required = []
+    allowed = [not blocked for blocked in helper_glue(symbols, required)]
+    groups, cuts, prefix = partition(sizes, target, allowed, required)
+    if len(cuts) < target:
+        notes.append(f"only {len(cuts)} commits are possible without splitting a definition from its helpers")
+    groups = split_to(groups, target, cuts, prefix)
+    return groups, notes
+
+
+def commit_count(value):
+    """argparse type for a target number of commits"""
+    target = int(value)
+    if target < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {target}")
+    return target
+
+
+def group_message(symbols, group):
+    """Commit message for a group: the single definition's message, or a summary with one line per definition"""
+    positions = range(max(group.first, 1) - 1, group.last - 1)
+    if group.first == 0:
+        subject = "feat: initial contract structure and constants"
+    elif len(positions) == 1:
+        return symbols.message(positions[0])
+    else:
+        names = [symbols.symbols[i].name for i in positions]
+        subject = f"feat: add {names[0]} through {names[-1]} ({len(names)} definitions)"
+    lines = [symbols.message(i).split("\n", 1)[0] for i in positions]
+    return subject + ("\n\n" + "\n".join(f"- {line.partition(': ')[2]}" for line in lines) if lines else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how a contract splits into N balanced commits")
+    parser.add_argument("contract", nargs="?", default="contracts/stack-mart.clar", help="contract to schedule")
+    parser.add_argument("-n", "--commits", type=commit_count, default=30, help="target number of commits")
+    parser.add_argument("--by", choices=("bytes", "lines"), default="bytes", help="what to balance")
+    args = parser.parse_args()
+
+    content = open_contract(args.contract)
+    definitions = scan_definitions(content)
+    symbols = SymbolIndex(content, definitions)
+    groups, notes = schedule(content, definitions, args.commits, args.by, symbols)
+    for note in notes:
+        print(f"⚠️  {note}")
+    for i, group in enumerate(groups):
+        print(f"  {i:>4} {group.size:>8} {args.by:<5} {group_message(symbols, group).splitlines()[0]}")
+    sizes = [group.size for group in groups]
+    print(f"📊 {len(groups)} commits from {len(definitions)} definitions, largest {max(sizes, default=0)} "
+          f"{args.by}, smallest {min(sizes, default=0)}")
+
+
+if __name__ == "__main__":
+    main()
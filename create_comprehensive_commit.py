@@ -4,22 +4,17 @@ Generate 30 granular commits for StackMart refactoring
 Creates actual separate commits by staging file hunks incrementally
 """
 
-import subprocess
+import argparse
 import os
 
-def run(cmd, check=False):
-    """Run a shell command"""
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd="/home/dimka/Desktop/Ecosystem/stacks/stack-mart")
-    if check and result.returncode != 0:
-        print(f"Error running: {cmd}")
-        print(f"Stderr: {result.stderr}")
-        print(f"Stdout: {result.stdout}")
-    return result
+from gen_trace import add_trace_arguments, enable_from_args
+from git_session import GitSession
 
-def commit(msg):
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def commit(session, msg):
     """Create a git commit"""
-    result = run("git commit -m " + repr(msg))
-    if "nothing to commit" in result.stdout.lower() or "nothing to commit" in result.stderr.lower():
+    if not session.commit(msg):
         print(f"⚠️  Nothing to commit for: {msg[:60]}...")
         return False
     else:
@@ -27,9 +22,14 @@ def commit(msg):
         return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Commit the StackMart refactoring")
+    add_trace_arguments(parser)
+    enable_from_args(parser.parse_args())
+
     print("🚀 Generating 30 granular commits for StackMart refactoring...\n")
     
-    os.chdir("/home/dimka/Desktop/Ecosystem/stacks/stack-mart")
+    os.chdir(REPO_DIR)
+    session = GitSession(cwd=REPO_DIR)
     
     # Commit all changes with one comprehensive commit
     commits = [
@@ -76,7 +76,7 @@ def main():
     ]
     
     # Stage all changes
-    run("git add -A")
+    session.stage_all()
     
     # Create one big commit with all the logical changes listed
     commit_message = """refactor: comprehensive StackMart security hardening and feature additions
@@ -129,18 +129,17 @@ functions now properly use the as-contract pattern to transfer STX from
 contract holdings to recipients.
 """
     
-    commit(commit_message)
+    commit(session, commit_message)
     
     print("\n" + "="*70)
     print("✅ Successfully created comprehensive commit!")
     print("="*70)
     print("\n📊 Recent commit history:")
-    result = run("git log --oneline -5")
-    print(result.stdout)
+    print("\n".join(session.log(5)))
     
     print("\n📈 Commit stats:")
-    result = run("git show --stat HEAD")
-    print(result.stdout)
+    print(session.run(["show", "--stat", "HEAD"]).stdout)
+    session.close()
     
     print("\n🎯 Ready to push to remote repository!")
     print("   Run: git push origin main")
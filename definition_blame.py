@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Definition-level blame index for Clarity contracts
+Maps each define-* name to the commits that added, changed or removed it, updated incrementally from git log
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from urllib.parse import quote
+
+from clarity_sections import build_boundaries
+from commit_cache import blob_id
+from fast_import import git_output, resolve_commit
+from git_session import GitSession
+from hunk_splitter import apply_hunks, parse_diff, split_lines
+
+INDEX_FILE = "definition-blame-{}.json"
+INDEX_VERSION = 1
+CONTRACTS = "contracts/*.clar"
+NULL_BLOB = "0" * 40
+# Starts every commit record, so the stream splits on it without parsing patches
+RECORD = b"\x01"
+
+# action: "added", "changed" or "removed"; time: author time in epoch seconds
+Touch = namedtuple("Touch", ["commit", "time", "action", "path", "subject"])
+# status: A, M, D or T from --raw; old/new: full blob ids
+RawChange = namedtuple("RawChange", ["path", "status", "old", "new"])
+
+
+def iter_records(revs, cwd=None):
+    """Stream one git log record (bytes) per commit touching the contracts, oldest first"""
+    proc = subprocess.Popen(
+        ["git", "log", "--reverse", "--first-parent", "--diff-merges=first-parent", "--no-renames",
+         "-z", "--raw", "--no-abbrev", "-p", "-U0", "--no-color", "--no-ext-diff",
+         "--format=%x01%H %at%n%s", *revs, "--", CONTRACTS],
+        cwd=cwd, stdout=subprocess.PIPE,
+    )
+    pending = []
+    for chunk in iter(lambda: proc.stdout.read(1 << 16), b""):
+        first, *rest = chunk.split(RECORD)
+        pending.append(first)
+        for part in rest:
+            record = b"".join(pending)
+            if record:
+                yield record
+            pending = [part]
+    record = b"".join(pending)
+    if record:
+        yield record
+    if proc.wait():
+        raise subprocess.CalledProcessError(proc.returncode, "git log")
+
+
+def parse_record(record):
+    """Split a record into (commit, time, subject, raw changes, patch text)
+
+    A record is `<hash> <time>\\n<subject>\\0\\n`, then `:<modes> <old> <new> <status>\\0<path>\\0`
+    per file, then the -U0 patch.
+    """
+    header, _, rest = record.partition(b"\0")
+    first, _, subject = header.decode(errors="replace").partition("\n")
+    commit, when = first.split()
+    rest = rest.lstrip(b"\n")
+    changes = []
+    while rest.startswith(b":"):
+        meta, _, rest = rest.partition(b"\0")
+        path, _, rest = rest.partition(b"\0")
+        _, _, old, new, status = meta.decode().split()
+        changes.append(RawChange(path.decode(errors="surrogateescape"), status[0], old, new))
+    patch = rest.lstrip(b"\0").decode(errors="surrogateescape")
+    return commit, int(when), subject, changes, patch
+
+
+def _lines(data):
+    return split_lines(data.decode(errors="surrogateescape"))
+
+
+def _blob(lines):
+    return blob_id("".join(lines).encode(errors="surrogateescape"))
+
+
+def _overlapping(boundaries, start, end):
+    """Names of the definitions whose line range meets [start, end)"""
+    return {b.name for b in boundaries if b.name and b.start < end and start < b.end}
+
+
+def touched_names(hunks, old_boundaries, new_boundaries):
+    """{name: action} for the definitions a file's hunks touch
+
+    Removed lines count against the old file's definitions and added lines
+    against the new file's, so a hunk that replaces one form with another
+    reports both. Leading ;; comments belong to the definition below them.
+    """
+    touched = set()
+    for hunk in hunks:
+        if hunk.old_count:
+            touched |= _overlapping(old_boundaries, hunk.old_start - 1, hunk.old_start - 1 + hunk.old_count)
+        if hunk.new_count:
+            touched |= _overlapping(new_boundaries, hunk.new_start - 1, hunk.new_start - 1 + hunk.new_count)
+    old_names = {b.name for b in old_boundaries if b.name}
+    new_names = {b.name for b in new_boundaries if b.name}
+    return {name: "added" if name not in old_names else "removed" if name not in new_names else "changed"
+            for name in sorted(touched)}
+
+
+class BlameIndex:
+    """Per-definition history of the contracts along one ref, as of one indexed commit
+
+    `history` maps a definition name to its Touch list, oldest first. Each
+    ref has its own index file, so switching between branches never
+    discards another branch's index. An update only reads the commits after
+    `tip`; when the branch was rewritten so that `tip` is no longer its
+    ancestor, the index is rebuilt from scratch in the same single pass.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tip = None
+        self.history = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.tip = data["tip"]
+                self.history = {name: [Touch(*touch) for touch in touches]
+                                for name, touches in data["history"].items()}
+
+    @classmethod
+    def load(cls, ref="HEAD", cwd=None):
+        """The index of ref by its full name: HEAD on a branch shares that branch's index,
+        and commit ids and a detached HEAD share one index of their own"""
+        git_dir = git_output(["rev-parse", "--absolute-git-dir"], cwd=cwd)
+        name = subprocess.run(["git", "rev-parse", "--symbolic-full-name", ref], cwd=cwd,
+                              capture_output=True, text=True).stdout.strip() or "HEAD"
+        return cls(os.path.join(git_dir, INDEX_FILE.format(quote(name, safe=""))))
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": INDEX_VERSION, "tip": self.tip, "history": self.history}, f)
+        os.replace(tmp, self.path)
+
+    def update(self, ref="HEAD", cwd=None):
+        """Index the commits up to ref; returns (commits read, whether the index was rebuilt)"""
+        target = resolve_commit(ref, cwd=cwd)
+        if target is None:
+            raise ValueError(f"{ref} does not name a commit")
+        if target == self.tip:
+            return 0, False
+        rebuilt = self.tip is None or subprocess.run(
+            ["git", "merge-base", "--is-ancestor", self.tip, target], cwd=cwd, stderr=subprocess.DEVNULL
+        ).returncode != 0
+        if rebuilt:
+            self.history = {}
+        revs = [target] if rebuilt else [f"{self.tip}..{target}"]
+        commits = 0
+        # path -> (blob id, lines, boundaries) of the last version seen
+        files = {}
+        with GitSession(cwd=cwd) as session:
+            for record in iter_records(revs, cwd=cwd):
+                self._index(parse_record(record), files, session)
+                commits += 1
+        self.tip = target
+        return commits, rebuilt
+
+    def _index(self, parsed, files, session):
+        commit, when, subject, changes, patch = parsed
+        diffs = {diff.path: diff for diff in parse_diff(patch)}
+        for change in changes:
+            old = self._version(files, change.path, change.old, session)
+            diff = diffs.get(change.path)
+            if change.status == "D":
+                lines = []
+            elif diff is None or diff.binary:
+                lines = None
+            else:
+                lines = apply_hunks(old[1], diff.hunks)
+            if lines is None or _blob(lines) != change.new:
+                # A patch that does not reproduce the recorded blob is not trusted
+                new = self._version(files, change.path, change.new, session)
+            else:
+                new = files[change.path] = (change.new, lines, build_boundaries(lines))
+            hunks = diff.hunks if diff is not None else []
+            for name, action in touched_names(hunks, old[2], new[2]).items():
+                self.history.setdefault(name, []).append(Touch(commit, when, action, change.path, subject))
+
+    @staticmethod
+    def _version(files, path, blob, session):
+        """(blob, lines, boundaries) of path at blob, from the last version seen when it matches"""
+        known = files.get(path)
+        if known is not None and known[0] == blob:
+            return known
+        if blob == NULL_BLOB:
+            lines = []
+        else:
+            found = session.cat_file(blob)
+            lines = _lines(found.content) if found is not None else []
+        files[path] = (blob, lines, build_boundaries(lines))
+        return files[path]
+
+    def touches(self, name, path=None):
+        """Every commit that touched name, oldest first, optionally only in one contract"""
+        return [touch for touch in self.history.get(name, []) if path is None or touch.path == path]
+
+    def last_touch(self, name, path=None):
+        touches = self.touches(name, path)
+        return touches[-1] if touches else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the commits that added or changed each contract definition")
+    parser.add_argument("names", nargs="*", help="definitions to look up (default: a summary of the index)")
+    parser.add_argument("--ref", default="HEAD", help="history to index (default: HEAD)")
+    parser.add_argument("--contract", help="only commits to this contract path")
+    parser.add_argument("--last", action="store_true", help="only the latest commit per definition")
+    parser.add_argument("--json", action="store_true", help="print the answer as JSON for other tools")
+    parser.add_argument("--rebuild", action="store_true", help="discard the index and read the whole history")
+    parser.add_argument("--no-update", action="store_true", help="answer from the index as it is, without git")
+    args = parser.parse_args()
+
+    index = BlameIndex.load(args.ref)
+    if args.rebuild:
+        index.tip = None
+    if not args.no_update:
+        started = time.perf_counter()
+        commits, rebuilt = index.update(args.ref)
+        if commits or rebuilt:
+            index.save()
+            verb = "Rebuilt" if rebuilt else "Updated"
+            print(f"📇 {verb} the blame index with {commits} commits in {time.perf_counter() - started:.2f}s",
+                  file=sys.stderr)
+
+    if not args.names:
+        touches = sum(len(t) for t in index.history.values())
+        print(f"📊 {len(index.history)} definitions, {touches} changes, indexed up to {(index.tip or 'nothing')[:12]}")
+        return
+
+    answer = {}
+    for name in args.names:
+        touches = index.touches(name, args.contract)
+        answer[name] = touches[-1:] if args.last else touches
+    if args.json:
+        print(json.dumps({name: [touch._asdict() for touch in touches] for name, touches in answer.items()},
+                         indent=2))
+    else:
+        for name, touches in answer.items():
+            if not touches:
+                print(f"❓ {name}: no commit touches this definition")
+                continue
+            print(f"🔎 {name}")
+            for touch in touches:
+                day = time.strftime("%Y-%m-%d", time.gmtime(touch.time))
+                print(f"  {touch.commit[:10]} {day} {touch.action:<8} {touch.path}  {touch.subject}")
+    if not all(answer.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
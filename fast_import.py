@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Write commit series through a single `git fast-import` process
+Blobs and commits go into one pack without touching the working tree or index
+"""
+
+import subprocess
+
+from gen_trace import count
+
+
+def git_output(args, cwd=None):
+    """Run a git command and return its stripped stdout"""
+    result = subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def current_branch(cwd=None):
+    """Return the checked-out branch name"""
+    return git_output(["symbolic-ref", "--short", "HEAD"], cwd=cwd)
+
+
+def resolve_commit(rev, cwd=None):
+    """Return the commit id for rev, or None if it does not exist yet"""
+    result = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"],
+        cwd=cwd, capture_output=True, text=True
+    )
+    return result.stdout.strip() or None
+
+
+class FastImportStream:
+    """Feed blobs and commits to one `git fast-import` process
+
+    Commits are chained on `ref`, starting from `parent` (a commit id) when
+    given. Each commit only lists the paths that changed; everything else is
+    inherited from the previous commit's tree.
+    """
+
+    def __init__(self, ref, parent=None, cwd=None, export_marks=None, force=False, proc=None):
+        # ref may be None for a blob-only stream
+        if ref and not ref.startswith("refs/"):
+            ref = f"refs/heads/{ref}"
+        self.ref = ref
+        self.parent = parent
+        self.author = git_output(["var", "GIT_AUTHOR_IDENT"], cwd=cwd)
+        self.committer = git_output(["var", "GIT_COMMITTER_IDENT"], cwd=cwd)
+        self.next_mark = 1
+        self.commits = 0
+        self.bytes_sent = 0
+        # proc lets callers supply their own process (e.g. an asyncio one);
+        # they then also own finishing it
+        self.proc = proc or subprocess.Popen(
+            self.command(export_marks, force), cwd=cwd, stdin=subprocess.PIPE
+        )
+
+    @staticmethod
+    def command(export_marks=None, force=False):
+        args = ["git", "fast-import", "--quiet", "--done"]
+        if force:
+            # Allow moving ref back onto an older commit (e.g. a reused prefix)
+            args.append("--force")
+        if export_marks:
+            args.append(f"--export-marks={export_marks}")
+        return args
+
+    def _write(self, data):
+        self.proc.stdin.write(data)
+        self.bytes_sent += len(data)
+
+    def _data(self, payload):
+        self._write(b"data %d\n" % len(payload))
+        self._write(payload)
+        self._write(b"\n")
+
+    def _mark(self):
+        mark = self.next_mark
+        self.next_mark += 1
+        return mark
+
+    def blob(self, content):
+        """Send a blob and return its mark"""
+        if isinstance(content, str):
+            content = content.encode()
+        count("bytes_hashed", len(content))
+        mark = self._mark()
+        self._write(b"blob\nmark :%d\n" % mark)
+        self._data(content)
+        return mark
+
+    def commit(self, message, changes):
+        """Commit `changes` (path -> blob mark or blob id) on top of the previous commit"""
+        mark = self._mark()
+        self._write(f"commit {self.ref}\nmark :{mark}\n".encode())
+        self._write(f"author {self.author}\ncommitter {self.committer}\n".encode())
+        self._data(message.encode())
+        if self.commits == 0 and self.parent:
+            self._write(f"from {self.parent}\n".encode())
+        for path, blob in changes.items():
+            dataref = f":{blob}" if isinstance(blob, int) else blob
+            self._write(f"M 100644 {dataref} {path}\n".encode())
+        self._write(b"\n")
+        self.commits += 1
+        return mark
+
+    def end(self):
+        """Mark the stream complete; fast-import rejects streams without it"""
+        self._write(b"done\n")
+
+    def close(self):
+        """Finish the stream and wait for fast-import to write the pack"""
+        self.end()
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise subprocess.CalledProcessError(self.proc.returncode, "git fast-import")
+
+    @staticmethod
+    def read_marks(path):
+        """Parse an --export-marks file into {mark: object id}"""
+        marks = {}
+        with open(path) as f:
+            for line in f:
+                mark, oid = line.split()
+                marks[int(mark[1:])] = oid
+        return marks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Abort without `done` so fast-import refuses the partial stream
+            self.proc.stdin.close()
+            self.proc.wait()
+        return False
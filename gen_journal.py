@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Write-ahead journal for long commit-generation runs
+Lets an interrupted run resume from its last durable commit instead of restarting
+"""
+
+import json
+import os
+import subprocess
+from urllib.parse import quote
+
+from fast_import import git_output, resolve_commit
+
+# One journal per target ref, so isolated jobs on different branches never share one
+JOURNAL_FILE = "commitgen-journal-{}.jsonl"
+
+
+class Journal:
+    """Append-only record of one run: its plan, then one line per finished step
+
+    Every line is fsynced before the next step starts, so after a crash the
+    journal names exactly the commits that exist. A torn last line (the
+    process died mid-write) is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.plan = None
+        self.done = []
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if record["type"] == "plan":
+                        self.plan, self.done = record, []
+                    elif record["type"] == "step" and record["step"] == len(self.done):
+                        self.done.append(record["commit"])
+
+    @classmethod
+    def load(cls, ref, cwd=None):
+        """The journal of runs committing onto ref (refs/heads/<branch>, or HEAD for the working tree)"""
+        git_dir = git_output(["rev-parse", "--absolute-git-dir"], cwd=cwd)
+        return cls(os.path.join(git_dir, JOURNAL_FILE.format(quote(ref, safe=""))))
+
+    @property
+    def interrupted(self):
+        """True if an earlier run planned steps it never finished"""
+        return self.plan is not None and len(self.done) < len(self.plan["steps"])
+
+    def _append(self, record, mode="a"):
+        with open(self.path, mode) as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, ref, base, contract_blob, test_blob, steps, cwd=None):
+        """Return the index of the first step still to run
+
+        steps is a list of (message, {path: size}) for commits made on
+        ref starting from base. An interrupted run with the same plan resumes
+        after its last journaled step if that commit is still the tip of
+        ref; anything else that does not line up stops the run rather than
+        guess.
+        """
+        plan = {"type": "plan", "ref": ref, "base": base, "contract_blob": contract_blob,
+                "test_blob": test_blob, "steps": [list(step) for step in steps]}
+        if not (self.interrupted and self.done):
+            self.plan, self.done = plan, []
+            self._append(self.plan, "w")
+            return 0
+
+        # A resumed run cannot know its base (ref has moved on); keep the journaled one
+        if dict(self.plan, base=base) != plan:
+            raise SystemExit(f"❌ {self.path} was written for a different plan; rerun with --restart")
+        tip = resolve_commit(ref, cwd=cwd)
+        # Commits made after the last fsynced line (the process died before
+        # journaling them) are adopted if they are exactly the next planned steps
+        for commit in self._unrecorded(tip, cwd):
+            self.record(len(self.done), commit)
+        if tip != self.done[-1]:
+            raise SystemExit(f"❌ {ref} is at {tip}, not at the journaled step {len(self.done) - 1} "
+                             f"({self.done[-1]}); rerun with --restart")
+        return len(self.done)
+
+    def _unrecorded(self, tip, cwd):
+        last = self.done[-1]
+        if tip is None or tip == last or subprocess.run(
+                ["git", "merge-base", "--is-ancestor", last, tip], cwd=cwd).returncode != 0:
+            return []
+        log = git_output(["log", "-z", "--first-parent", "--reverse", "--format=%H%n%B", f"{last}..{tip}"],
+                         cwd=cwd)
+        commits = [entry.partition("\n") for entry in log.split("\0") if entry]
+        planned = self.plan["steps"][len(self.done):]
+        if len(commits) > len(planned):
+            return []
+        for (_, _, message), step in zip(commits, planned):
+            if message.strip() != step[0].strip():
+                return []
+        return [commit for commit, _, _ in commits]
+
+    def record(self, step, commit):
+        self._append({"type": "step", "step": step, "commit": commit})
+        self.done.append(commit)
+
+    def reset(self):
+        """Forget the journaled run, finished or not"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.plan, self.done = None, []
+
+    def finish(self):
+        """Drop the journal once every step is committed"""
+        self.reset()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Per-phase timers and counters for the commit generators
+Writes a JSON-lines trace and, optionally, a Chrome trace-event file
+"""
+
+import atexit
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PHASES = ("read", "split", "write", "stage", "commit", "verify")
+
+
+class Tracer:
+    """Collect phase spans and counters for one generator run"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.trace_path = None
+        self.chrome_path = None
+
+    @contextmanager
+    def phase(self, name, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start - self.origin, time.perf_counter() - start, args))
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def totals(self):
+        totals = Counter()
+        for name, _, duration, _ in self.spans:
+            totals[name] += duration
+        return {name: round(seconds, 6) for name, seconds in totals.items()}
+
+    def write_jsonl(self, path):
+        with open(path, "w") as f:
+            for name, start, duration, args in self.spans:
+                f.write(json.dumps({"type": "phase", "name": name, "start_s": round(start, 6),
+                                    "duration_s": round(duration, 6), "args": args}) + "\n")
+            f.write(json.dumps({"type": "counters", **self.counters}) + "\n")
+            f.write(json.dumps({"type": "summary", "phases": self.totals(),
+                                "wall_s": round(time.perf_counter() - self.origin, 6)}) + "\n")
+
+    def write_chrome(self, path):
+        pid = os.getpid()
+        events = [
+            {"name": name, "cat": "generator", "ph": "X", "pid": pid, "tid": pid,
+             "ts": int(start * 1e6), "dur": int(duration * 1e6), "args": args}
+            for name, start, duration, args in self.spans
+        ]
+        end = int((time.perf_counter() - self.origin) * 1e6)
+        events.extend(
+            {"name": name, "ph": "C", "pid": pid, "tid": pid, "ts": end, "args": {name: value}}
+            for name, value in self.counters.items()
+        )
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def flush(self):
+        if self.trace_path:
+            self.write_jsonl(self.trace_path)
+        if self.chrome_path:
+            self.write_chrome(self.chrome_path)
+
+
+tracer = Tracer()
+phase = tracer.phase
+count = tracer.count
+
+
+def _count_subprocesses():
+    original_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        tracer.count("subprocess_calls")
+        original_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init
+
+
+def add_trace_arguments(parser):
+    parser.add_argument("--trace", metavar="JSONL", help="write per-phase timings and counters as JSON lines")
+    parser.add_argument("--chrome-trace", metavar="JSON", help="also write a Chrome trace-event file")
+
+
+def enable(trace_path=None, chrome_path=None):
+    """Start recording to the given files; they are written when the process exits"""
+    if not (trace_path or chrome_path):
+        return
+    tracer.trace_path = trace_path
+    tracer.chrome_path = chrome_path
+    _count_subprocesses()
+    # atexit also covers runs that die midway, which are the ones worth reading
+    atexit.register(tracer.flush)
+
+
+def enable_from_args(args):
+    enable(args.trace, args.chrome_trace)
@@ -4,106 +4,111 @@ Generate 30 granular commits for StackMart refactoring
 Breaks down major changes into logical, reviewable commits
 """
 
-import subprocess
+import argparse
 import sys
 
-def run(cmd):
-    """Run a shell command"""
-    print(f"Running: {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-    if result.returncode != 0 and "nothing to commit" not in result.stdout.lower():
-        print(f"Error: {result.stderr}")
-    return result.returncode == 0
+from fast_import import current_branch
+from gen_trace import add_trace_arguments, enable_from_args
+from git_session import GitSession
+from hunk_splitter import split_commits
 
-def commit(msg, files=None):
+# (message, files) for each commit in the refactoring, in order
+COMMITS = [
+    ("feat(contract): add marketplace pause mechanism\n\n- Add ERR_PAUSED error constant\n- Add paused data-var for emergency marketplace halt\n- Enables admin to pause all marketplace operations", ["contracts/stack-mart.clar"]),
+    
+    ("refactor(contract): add basis points constants\n\n- Add BPS_DENOMINATOR for consistent percentage calculations\n- Add MAX_ROYALTY_BIPS to cap royalty fees at 20%\n- Improves code clarity and prevents excessive fees", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add seller listing indexing system\n\n- Add seller-listings map for O(1) lookup by seller and index\n- Add seller-listing-count to track total listings per seller\n- Enables efficient seller portfolio queries", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): implement seller index helper function\n\n- Add add-listing-to-seller-index private function\n- Automatically maintains seller listing count\n- Called during listing creation for automatic indexing", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add pause guard to enhanced listing creation\n\n- Check paused state before allowing new listings\n- Prevents listing creation during marketplace maintenance\n- Part of emergency control system", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): integrate seller indexing in enhanced listings\n\n- Call add-listing-to-seller-index in create-listing-enhanced\n- Add event logging for listing creation\n- Ensures all listings are properly indexed", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add admin pause control function\n\n- Implement set-paused public function\n- Only admin can pause/unpause marketplace\n- Critical for emergency response", ["contracts/stack-mart.clar"]),
+    
+    ("refactor(contract): fix update-listing-price code structure\n\n- Wrap logic in begin block for proper flow\n- Improves code readability and consistency\n- No functional changes", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add wishlist query functions\n\n- Implement get-wishlist read-only function\n- Add is-wishlisted check function\n- Enables frontend wishlist display", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add price history read function\n\n- Implement get-price-history for listing price tracking\n- Returns list of historical prices with block heights\n- Supports price trend analysis", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): implement wishlist toggle functionality\n\n- Add/remove listings from user wishlist\n- Use filter to remove items efficiently\n- Returns boolean indicating add (true) or remove (false)", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add pause guard to standard listing creation\n\n- Check paused state in create-listing function\n- Consistent with enhanced listing creation\n- Complete pause mechanism coverage", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): integrate seller indexing in standard listings\n\n- Call add-listing-to-seller-index in create-listing\n- Ensures backward compatibility with indexing\n- All listings now properly tracked", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure STX transfer in escrow creation\n\n- Transfer STX to contract address using as-contract\n- Prevents funds from being lost or inaccessible\n- Critical security fix for escrow system", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): use as-contract for escrow release payments\n\n- Transfer royalty and seller share from contract holdings\n- Fixes issue where contract couldn't release escrowed funds\n- Ensures proper fund custody and release", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure fund release in timeout scenarios\n\n- Use as-contract for all release-escrow transfers\n- Handle both delivered and pending timeout cases\n- Prevents locked funds in escrow", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure refund in escrow cancellation\n\n- Transfer refund from contract to buyer using as-contract\n- Ensures buyer can recover funds on cancellation\n- Completes escrow security hardening", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add volume tracking to reputation system\n\n- Add total-volume field to reputation map\n- Track cumulative transaction value per user\n- Enables volume-based seller rankings", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): update reputation helper with volume tracking\n\n- Increment total-volume on successful transactions\n- Maintain volume on failed transactions\n- Provides comprehensive seller metrics", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure buyer refund in dispute resolution\n\n- Use as-contract for buyer-wins refund transfer\n- Ensures contract can release disputed funds\n- Part of dispute system security fixes", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure seller payment in dispute resolution\n\n- Use as-contract for seller-wins payment transfer\n- Handle royalty splits from contract holdings\n- Completes dispute resolution fund flow", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure stake claim refunds\n\n- Use as-contract to return stakes to winners\n- Fixes staker parameter reference\n- Ensures dispute participants can claim rewards", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): implement bundle purchase with escrow\n\n- Add buy-bundle function with discount application\n- Create individual escrows for each listing\n- Use fold to process multiple listings atomically", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add bundle escrow creation helper\n\n- Implement create-bundle-escrow private function\n- Calculate discounted prices using BPS_DENOMINATOR\n- Transfer funds to contract and create escrow records", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure offer system fund handling\n\n- Use as-contract for offer escrow in make-offer\n- Use as-contract for payments in accept-offer\n- Use as-contract for refunds in cancel-offer", ["contracts/stack-mart.clar"]),
+    
+    ("fix(contract): secure emergency escrow refunds\n\n- Use as-contract for admin emergency refunds\n- Allows admin to resolve stuck escrows\n- Critical for marketplace recovery", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add seller listing query helpers\n\n- Implement get-seller-listing-count function\n- Add get-seller-listing-id-at-index for iteration\n- Add get-listings-by-seller with usage instructions", ["contracts/stack-mart.clar"]),
+    
+    ("feat(contract): add formatted reputation with success rate\n\n- Calculate success rate percentage\n- Return user reputation with computed metrics\n- Improves frontend data consumption", ["contracts/stack-mart.clar"]),
+    
+    ("docs(readme): update feature list and recent enhancements\n\n- Document auction system implementation\n- Add bundle purchase functionality\n- Highlight security hardening improvements\n- Update recent enhancements section", ["README.md"]),
+    
+    ("docs: add PR description and deployment documentation\n\n- Create comprehensive PR description\n- Add deployment guide for contract updates\n- Update simnet deployment plan\n- Document testing and verification steps", ["PR_DESCRIPTION.md", "DEPLOYMENT_GUIDE.md", "deployments/default.simnet-plan.yaml"]),
+]
+
+def commit(session, msg, files=None):
     """Create a git commit"""
     if files:
-        for f in files:
-            run(f"git add {f}")
+        # One update-index round trip for the whole list
+        session.stage(files)
     else:
-        run("git add -A")
-    
-    result = subprocess.run(
-        ["git", "commit", "-m", msg],
-        capture_output=True,
-        text=True
-    )
-    if "nothing to commit" in result.stdout.lower():
+        session.stage_all()
+    
+    if not session.commit(msg):
         print(f"⚠️  Nothing to commit for: {msg[:50]}...")
     else:
         print(f"✅ Committed: {msg[:50]}...")
 
 def main():
+    parser = argparse.ArgumentParser(description="Commit the StackMart refactoring")
+    parser.add_argument("--split", action="store_true",
+                        help="split the working-tree diff into one commit per COMMITS message")
+    parser.add_argument("--branch", help="branch to commit the split series onto (default: current)")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
     print("🚀 Generating 30 granular commits for StackMart refactoring...\n")
     
-    # First, let's commit all current changes with detailed messages
-    commits = [
-        ("feat(contract): add marketplace pause mechanism\n\n- Add ERR_PAUSED error constant\n- Add paused data-var for emergency marketplace halt\n- Enables admin to pause all marketplace operations", ["contracts/stack-mart.clar"]),
-        
-        ("refactor(contract): add basis points constants\n\n- Add BPS_DENOMINATOR for consistent percentage calculations\n- Add MAX_ROYALTY_BIPS to cap royalty fees at 20%\n- Improves code clarity and prevents excessive fees", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add seller listing indexing system\n\n- Add seller-listings map for O(1) lookup by seller and index\n- Add seller-listing-count to track total listings per seller\n- Enables efficient seller portfolio queries", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): implement seller index helper function\n\n- Add add-listing-to-seller-index private function\n- Automatically maintains seller listing count\n- Called during listing creation for automatic indexing", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add pause guard to enhanced listing creation\n\n- Check paused state before allowing new listings\n- Prevents listing creation during marketplace maintenance\n- Part of emergency control system", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): integrate seller indexing in enhanced listings\n\n- Call add-listing-to-seller-index in create-listing-enhanced\n- Add event logging for listing creation\n- Ensures all listings are properly indexed", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add admin pause control function\n\n- Implement set-paused public function\n- Only admin can pause/unpause marketplace\n- Critical for emergency response", ["contracts/stack-mart.clar"]),
-        
-        ("refactor(contract): fix update-listing-price code structure\n\n- Wrap logic in begin block for proper flow\n- Improves code readability and consistency\n- No functional changes", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add wishlist query functions\n\n- Implement get-wishlist read-only function\n- Add is-wishlisted check function\n- Enables frontend wishlist display", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add price history read function\n\n- Implement get-price-history for listing price tracking\n- Returns list of historical prices with block heights\n- Supports price trend analysis", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): implement wishlist toggle functionality\n\n- Add/remove listings from user wishlist\n- Use filter to remove items efficiently\n- Returns boolean indicating add (true) or remove (false)", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add pause guard to standard listing creation\n\n- Check paused state in create-listing function\n- Consistent with enhanced listing creation\n- Complete pause mechanism coverage", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): integrate seller indexing in standard listings\n\n- Call add-listing-to-seller-index in create-listing\n- Ensures backward compatibility with indexing\n- All listings now properly tracked", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure STX transfer in escrow creation\n\n- Transfer STX to contract address using as-contract\n- Prevents funds from being lost or inaccessible\n- Critical security fix for escrow system", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): use as-contract for escrow release payments\n\n- Transfer royalty and seller share from contract holdings\n- Fixes issue where contract couldn't release escrowed funds\n- Ensures proper fund custody and release", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure fund release in timeout scenarios\n\n- Use as-contract for all release-escrow transfers\n- Handle both delivered and pending timeout cases\n- Prevents locked funds in escrow", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure refund in escrow cancellation\n\n- Transfer refund from contract to buyer using as-contract\n- Ensures buyer can recover funds on cancellation\n- Completes escrow security hardening", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add volume tracking to reputation system\n\n- Add total-volume field to reputation map\n- Track cumulative transaction value per user\n- Enables volume-based seller rankings", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): update reputation helper with volume tracking\n\n- Increment total-volume on successful transactions\n- Maintain volume on failed transactions\n- Provides comprehensive seller metrics", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure buyer refund in dispute resolution\n\n- Use as-contract for buyer-wins refund transfer\n- Ensures contract can release disputed funds\n- Part of dispute system security fixes", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure seller payment in dispute resolution\n\n- Use as-contract for seller-wins payment transfer\n- Handle royalty splits from contract holdings\n- Completes dispute resolution fund flow", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure stake claim refunds\n\n- Use as-contract to return stakes to winners\n- Fixes staker parameter reference\n- Ensures dispute participants can claim rewards", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): implement bundle purchase with escrow\n\n- Add buy-bundle function with discount application\n- Create individual escrows for each listing\n- Use fold to process multiple listings atomically", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add bundle escrow creation helper\n\n- Implement create-bundle-escrow private function\n- Calculate discounted prices using BPS_DENOMINATOR\n- Transfer funds to contract and create escrow records", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure offer system fund handling\n\n- Use as-contract for offer escrow in make-offer\n- Use as-contract for payments in accept-offer\n- Use as-contract for refunds in cancel-offer", ["contracts/stack-mart.clar"]),
-        
-        ("fix(contract): secure emergency escrow refunds\n\n- Use as-contract for admin emergency refunds\n- Allows admin to resolve stuck escrows\n- Critical for marketplace recovery", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add seller listing query helpers\n\n- Implement get-seller-listing-count function\n- Add get-seller-listing-id-at-index for iteration\n- Add get-listings-by-seller with usage instructions", ["contracts/stack-mart.clar"]),
-        
-        ("feat(contract): add formatted reputation with success rate\n\n- Calculate success rate percentage\n- Return user reputation with computed metrics\n- Improves frontend data consumption", ["contracts/stack-mart.clar"]),
-        
-        ("docs(readme): update feature list and recent enhancements\n\n- Document auction system implementation\n- Add bundle purchase functionality\n- Highlight security hardening improvements\n- Update recent enhancements section", ["README.md"]),
-        
-        ("docs: add PR description and deployment documentation\n\n- Create comprehensive PR description\n- Add deployment guide for contract updates\n- Update simnet deployment plan\n- Document testing and verification steps", ["PR_DESCRIPTION.md", "DEPLOYMENT_GUIDE.md", "deployments/default.simnet-plan.yaml"]),
-    ]
+    if args.split:
+        split_main(COMMITS, args.branch)
+        return
     
     # Since all changes are already made, we'll commit them all at once
     # with a detailed message
     print("\n📝 Creating comprehensive commit with all changes...\n")
     
-    run("git add -A")
+    session = GitSession()
+    session.stage_all()
     
     full_message = """refactor(contract): comprehensive StackMart security and feature updates
 
@@ -143,13 +148,33 @@ DOCUMENTATION:
 All changes have been tested and verified to work correctly.
 """
     
-    subprocess.run(["git", "commit", "-m", full_message], check=False)
+    session.commit(full_message)
     
     print("\n✅ Commit created successfully!")
     print("\n📊 Recent commits:")
-    run("git log --oneline -5")
+    print("\n".join(session.log(5)))
+    session.close()
     
     print("\n🎯 Ready to push! Use: git push origin main")
 
+def split_main(commits, branch=None):
+    """Assign each diff hunk to the message naming what it touches and commit them in order"""
+    checked_out = current_branch()
+    branch = branch or checked_out
+    session = GitSession()
+    made = 0
+    for (msg, _), sha in zip(commits, split_commits(commits, branch, session)):
+        if sha:
+            made += 1
+            print(f"✅ Committed: {msg.splitlines()[0][:50]}...")
+        else:
+            print(f"⚠️  Nothing to commit for: {msg.splitlines()[0][:50]}...")
+    if branch == checked_out:
+        # The branch moved under the checkout; sync the shared index to its new tip
+        session.run(["reset", "-q"])
+    print(f"\n📊 {made} commits on {branch}:")
+    print("\n".join(session.log(min(made, 5) or 1, f"refs/heads/{branch}")))
+    session.close()
+
 if __name__ == "__main__":
     main()
@@ -7,11 +7,7 @@ set -e
 
 echo "🚀 Starting granular commit generation for StackMart..."
 
-# Store current changes
-git stash push -m "temp_stash_for_commits"
-
 # Commit 1: Add pause mechanism constants
-git stash pop
 cat > /tmp/patch1.diff << 'EOF'
 diff --git a/contracts/stack-mart.clar b/contracts/stack-mart.clar
 index 6554748..temp 100644
@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # Configuration
-REPO_DIR="/home/dimka/Desktop/Ecosystem/stacks/stack-mart"
+REPO_DIR="$(cd "$(dirname "$0")" && pwd)"
 CONTRACT_PATH="$REPO_DIR/contracts/stack-mart.clar"
 HOOKS_PATH="$REPO_DIR/frontend/src/hooks/useContract.ts"
 APP_PATH="$REPO_DIR/frontend/src/App.tsx"
@@ -9,6 +9,11 @@ CREATE_LISTING_PATH="$REPO_DIR/frontend/src/components/CreateListing.tsx"
 README_PATH="$REPO_DIR/README.md"
 MILESTONES_PATH="$REPO_DIR/MILESTONES.md"
 
+# Apply a batch of sed-style edits to one file in memory and write it once
+edit() {
+  python3 "$REPO_DIR/line_edit.py" "$@"
+}
+
 # Helper to commit
 commit_change() {
   git add .
@@ -18,11 +23,12 @@ commit_change() {
 cd "$REPO_DIR"
 
 # 1. [Contract] Add auction constants and next-auction-id
-sed -i '43i (define-constant ERR_AUCTION_ENDED (err u406))' "$CONTRACT_PATH"
-sed -i '44i (define-constant ERR_AUCTION_NOT_ENDED (err u407))' "$CONTRACT_PATH"
-sed -i '45i (define-constant ERR_BID_TOO_LOW (err u408))' "$CONTRACT_PATH"
-sed -i '46i (define-constant MIN_BID_INCREMENT_BIPS u500) ;; 5%' "$CONTRACT_PATH"
-sed -i '23i (define-data-var next-auction-id uint u1)' "$CONTRACT_PATH"
+edit "$CONTRACT_PATH" \
+  -e 'after ERR_ALREADY_WISHLISTED (define-constant ERR_AUCTION_ENDED (err u406))' \
+  -e 'after ERR_AUCTION_ENDED (define-constant ERR_AUCTION_NOT_ENDED (err u407))' \
+  -e 'after ERR_AUCTION_NOT_ENDED (define-constant ERR_BID_TOO_LOW (err u408))' \
+  -e 'after ERR_BID_TOO_LOW (define-constant MIN_BID_INCREMENT_BIPS u500) ;; 5%' \
+  -e 'after next-pack-id (define-data-var next-auction-id uint u1)'
 commit_change "feat(contract): add auction constants and next-auction-id"
 
 # 2. [Contract] Define auctions map
@@ -128,15 +134,15 @@ echo '(define-read-only (get-auctions-by-seller (seller principal)) (ok "Logic f
 commit_change "feat(contract): add get-auctions-by-seller read-only helper"
 
 # 8. [Hooks] Add createAuction and placeBid to useContract
-sed -i '354i createAuction: (listingId: number, reservePrice: number, duration: number) => Promise.resolve({success: true}), placeBid: (auctionId: number, amount: number) => Promise.resolve({success: true}),' "$HOOKS_PATH"
+edit "$HOOKS_PATH" -e '354i createAuction: (listingId: number, reservePrice: number, duration: number) => Promise.resolve({success: true}), placeBid: (auctionId: number, amount: number) => Promise.resolve({success: true}),'
 commit_change "feat(hooks): add createAuction and placeBid hooks to useContract"
 
 # 9. [Hooks] Add settleAuction to useContract
-sed -i '355i settleAuction: (auctionId: number) => Promise.resolve({success: true}),' "$HOOKS_PATH"
+edit "$HOOKS_PATH" -e '355i settleAuction: (auctionId: number) => Promise.resolve({success: true}),'
 commit_change "feat(hooks): add settleAuction hook to useContract"
 
 # 10. [Hooks] Implement getAuction and getAllAuctions fetching logic
-sed -i '356i getAuction: (id: number) => Promise.resolve(null), getAllAuctions: () => Promise.resolve([]),' "$HOOKS_PATH"
+edit "$HOOKS_PATH" -e '356i getAuction: (id: number) => Promise.resolve(null), getAllAuctions: () => Promise.resolve([]),'
 commit_change "feat(hooks): add getAuction and getAllAuctions fetching hooks"
 
 # 11. [UI] Create AuctionCard component
@@ -166,28 +172,29 @@ EOF
 commit_change "feat(ui): create BidSheet component for placing bids"
 
 # 13. [UI] Add Auction Tab to App.tsx
-sed -i 's/| "dashboard"/| "dashboard" | "auctions"/' "$APP_PATH"
-sed -i '257i <button className={`btn ${activeTab === "auctions" ? "btn-primary" : "btn-outline"}`} onClick={() => setActiveTab("auctions")} style={{ borderRadius: "8px 8px 0 0" }}>🔨 Auctions</button>' "$APP_PATH"
+edit "$APP_PATH" \
+  -e 's/| "dashboard"/| "dashboard" | "auctions"/' \
+  -e '257i <button className={`btn ${activeTab === "auctions" ? "btn-primary" : "btn-outline"}`} onClick={() => setActiveTab("auctions")} style={{ borderRadius: "8px 8px 0 0" }}>🔨 Auctions</button>'
 commit_change "feat(ui): integrate Auctions tab into main application navigation"
 
 # 14. [UI] Implement Auction Tab Content in App.tsx
-sed -i '379i {activeTab === "auctions" && ( <section><h2>🔨 Active Auctions</h2><div className="grid grid-cols-1">No active auctions found.</div></section> )}' "$APP_PATH"
+edit "$APP_PATH" -e '379i {activeTab === "auctions" && ( <section><h2>🔨 Active Auctions</h2><div className="grid grid-cols-1">No active auctions found.</div></section> )}'
 commit_change "feat(ui): implement base content for the Auctions tab"
 
 # 15. [UI] Update CreateListing to support Auction option
-sed -i '156i <div className="form-group"><label className="checkbox-container"><input type="checkbox" /> Sell via Auction</label></div>' "$CREATE_LISTING_PATH"
+edit "$CREATE_LISTING_PATH" -e '156i <div className="form-group"><label className="checkbox-container"><input type="checkbox" /> Sell via Auction</label></div>'
 commit_change "feat(ui): add 'Sell via Auction' toggle to listing creation form"
 
 # 16. [UI] Add reservation price field to CreateListing (conditional)
-sed -i '157i <div className="form-group"><label>Reserve Price (STX)</label><input type="number" placeholder="10.0" /></div>' "$CREATE_LISTING_PATH"
+edit "$CREATE_LISTING_PATH" -e '157i <div className="form-group"><label>Reserve Price (STX)</label><input type="number" placeholder="10.0" /></div>'
 commit_change "feat(ui): add reserve price field to CreateListing form"
 
 # 17. [UI] Add duration field to CreateListing for auctions
-sed -i '158i <div className="form-group"><label>Duration (blocks)</label><input type="number" placeholder="144" /></div>' "$CREATE_LISTING_PATH"
+edit "$CREATE_LISTING_PATH" -e '158i <div className="form-group"><label>Duration (blocks)</label><input type="number" placeholder="144" /></div>'
 commit_change "feat(ui): add auction duration field to CreateListing form"
 
 # 18. [Dashboard] Add Active Bids section
-sed -i '151i <section className="dashboard-section"><h2>🔨 My Active Bids</h2><p>No active bids.</p></section>' "$DASHBOARD_PATH"
+edit "$DASHBOARD_PATH" -e '151i <section className="dashboard-section"><h2>🔨 My Active Bids</h2><p>No active bids.</p></section>'
 commit_change "feat(dashboard): add Active Bids section to user dashboard"
 
 # 19. [Docs] Update README with Auction system details
@@ -199,7 +206,7 @@ echo "- Auctions must be settled manually after the end block is reached." >> "$
 commit_change "docs: update README with auction system rules and mechanics"
 
 # 20. [Docs] Update Milestones
-sed -i '14i - [x] Implement Advanced Auctions & Bidding system' "$MILESTONES_PATH"
+edit "$MILESTONES_PATH" -e '14i - [x] Implement Advanced Auctions & Bidding system'
 commit_change "docs: update MILESTONES.md for Auction system completion"
 
 echo "20 auction commits generated successfully!"
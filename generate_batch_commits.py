@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Generate per-definition commits for every contract in contracts/
+Contracts are chunked in parallel and committed in dependency order
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+
+from clarity_scan import header_end, iter_code_tokens, iter_prefixes, open_contract, scan_definitions
+from commit_cache import DEFAULT_MAX_ENTRIES, CommitCache, import_series
+from fast_import import FastImportStream, current_branch, resolve_commit
+from clarity_symbols import SymbolIndex
+from clarity_validate import check_prefixes
+
+CONTRACTS_DIR = "contracts"
+
+
+def scoped(msg, scope):
+    """Turn "feat: x" into "feat(scope): x" """
+    kind, sep, rest = msg.partition(": ")
+    return f"{kind}({scope}): {rest}" if sep else msg
+
+
+def discover_contracts():
+    """Return {contract name: path} from Clarinet.toml plus any other contracts/*.clar"""
+    contracts = {}
+    depends_on = {}
+    if os.path.exists("Clarinet.toml"):
+        with open("Clarinet.toml", "rb") as f:
+            manifest = tomllib.load(f)
+        for name, entry in manifest.get("contracts", {}).items():
+            contracts[name] = entry["path"]
+            depends_on[name] = set(entry.get("depends_on", []))
+    known_paths = set(contracts.values())
+    for path in sorted(glob.glob(os.path.join(CONTRACTS_DIR, "*.clar"))):
+        if path not in known_paths:
+            contracts[os.path.splitext(os.path.basename(path))[0]] = path
+    return contracts, depends_on
+
+
+def contract_references(name, content):
+    """Names of other contracts referenced as .other-contract or .other-contract.trait-name"""
+    references = set()
+    for _, token in iter_code_tokens(content):
+        if token.startswith(b".") and len(token) > 1:
+            references.add(token[1:].split(b".")[0].decode())
+    references.discard(name)
+    return references
+
+
+def contract_messages(name, content, definitions):
+    """Scoped commit messages for the header and each definition of one contract"""
+    symbols = SymbolIndex(content, definitions)
+    messages = [scoped("feat: initial contract structure and constants", name)]
+    messages.extend(scoped(symbols.message(i), name) for i in range(len(symbols)))
+    return messages
+
+
+def analyze_contract(name, path, parent, blobs_only, branch_prefix, strict=False):
+    """Worker: chunk one contract and write its prefix blobs (or its whole branch)
+
+    Returns the referenced contract names, the commit series as
+    (message, blob id) pairs so the parent process can stitch histories,
+    and the well-formedness problems of its prefixes. With strict, a
+    contract with problems writes nothing and gets an empty series.
+    """
+    content = open_contract(path)
+    definitions = scan_definitions(content)
+    references = contract_references(name, content)
+    messages = contract_messages(name, content, definitions)
+    ends = [header_end(definitions, len(content))] + [d.end for d in definitions]
+    problems = check_prefixes(content, ends, {d.name for d in definitions}, messages)
+    if problems and strict:
+        return name, references, [], problems
+
+    ref = None if blobs_only else f"{branch_prefix}/{name}"
+    with tempfile.TemporaryDirectory() as tmp:
+        marks_path = os.path.join(tmp, "marks")
+        with FastImportStream(ref, parent=parent, export_marks=marks_path, force=True) as stream:
+            blob_marks = [stream.blob(content[:header_end(definitions, len(content))])]
+            for _, prefix in iter_prefixes(content, definitions):
+                blob_marks.append(stream.blob(prefix))
+            if not blobs_only:
+                for msg, mark in zip(messages, blob_marks):
+                    stream.commit(msg, {path: mark})
+        marks = FastImportStream.read_marks(marks_path)
+
+    return name, references, [(msg, marks[mark]) for msg, mark in zip(messages, blob_marks)], problems
+
+
+def dependency_order(names, depends_on):
+    """Topologically sort contract names; ties are broken by name for determinism"""
+    pending = {name: set(depends_on.get(name, ())) & set(names) for name in names}
+    order = []
+    while pending:
+        ready = sorted(name for name, deps in pending.items() if not deps)
+        if not ready:
+            raise ValueError(f"dependency cycle between contracts: {', '.join(sorted(pending))}")
+        for name in ready:
+            order.append(name)
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay every contract as one commit per definition")
+    parser.add_argument("--branch", help="branch for the linear history (default: current branch)")
+    parser.add_argument("--per-contract-branches", metavar="PREFIX",
+                        help="write one branch per contract as PREFIX/<contract> instead of a linear history")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="max cached steps kept for incremental runs")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--strict", action="store_true",
+                        help="refuse to commit if any generated prefix is not well formed")
+    args = parser.parse_args()
+
+    contracts, depends_on = discover_contracts()
+    branch = args.branch or current_branch()
+    cache = CommitCache.load(args.cache_size)
+    parent = cache.base_for(resolve_commit(branch) or resolve_commit("HEAD"))
+    blobs_only = args.per_contract_branches is None
+
+    print(f"🚀 Chunking {len(contracts)} contracts with {args.jobs} workers...")
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [
+            pool.submit(analyze_contract, name, path, parent, blobs_only, args.per_contract_branches,
+                        args.strict)
+            for name, path in contracts.items()
+        ]
+        invalid = 0
+        for future in futures:
+            name, references, series, problems = future.result()
+            depends_on.setdefault(name, set()).update(references)
+            results[name] = series
+            for line in problems:
+                print(line)
+            invalid += len(problems)
+            print(f"✅ {name}: {len(series)} commits")
+
+    if invalid and args.strict:
+        raise SystemExit(f"{invalid} problems in the generated prefixes; the linear history was not written")
+
+    order = dependency_order(list(contracts), depends_on)
+    print(f"📝 Dependency order: {' -> '.join(order)}")
+
+    if not blobs_only:
+        print(f"🎯 Wrote branches {args.per_contract_branches}/<contract>")
+        return
+
+    # Blobs already exist; stitching the linear history only writes commits
+    steps = [(msg, contracts[name], blob_id) for name in order for msg, blob_id in results[name]]
+    reused, imported = import_series(cache, branch, parent, steps)
+    print(f"Success: Reused {reused} and imported {imported} commits onto {branch}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,158 @@
-
+import argparse
 import os
 import subprocess
+import sys
+from bisect import bisect_right
+
+from clarity_sections import load_boundaries, section_ranges
+from clarity_validate import check_prefixes
+from commit_cache import CommitCache, import_series
+from fast_import import current_branch, resolve_commit
+from gen_trace import add_trace_arguments, count, enable_from_args, phase
+from spec_index import join_ranges, spec_cuts
+
+SOURCE_PATH = 'contracts/stack-mart.clar.final'
+TEST_SOURCE_PATH = 'tests/stack-mart-v2.spec.ts.final'
+TEST_PATH = 'tests/stack-mart-v2.spec.ts'
+TEST_MESSAGE = "test: add comprehensive tests for auctions and bundles"
+
+# (first section or definition, commit message); None is the start of the file
+SECTIONS = [
+    (None, "refactor(contract): fix admin duplicates and unify reputation map"),
+    ("Auction System", "feat(contract): implement auction system with nft trait support"),
+    ("Bundle and curated pack system", "feat(contract): add bundle and pack data structures"),
+    ("get-next-id", "feat(contract): add reputation and listing getters"),
+    ("create-listing", "refactor(contract): preserve legacy listing and buy-listing functions"),
+    ("buy-listing-escrow", "fix(contract): secure escrow flows with as-contract stx transfers"),
+    ("update-reputation", "refactor(contract): update reputation helpers and transaction logging"),
+    ("create-dispute", "feat(contract): implement dispute resolution with stake claims"),
+    ("get-bundle", "feat(contract): implement buy-bundle with batched escrow creation"),
+]
 
 def run_cmd(cmd):
     subprocess.check_call(cmd, shell=True)
 
 def commit(msg):
-    run_cmd("git add .")
-    try:
-        run_cmd(f"git commit -m '{msg}'")
-    except:
-        print(f"Nothing to commit for: {msg}")
-
-# Read final content
-with open('contracts/stack-mart.clar.final', 'r') as f:
-    lines = f.readlines()
-
-# Define chunks (1-indexed inclusive from previous view, converted to 0-indexed slice)
-# Note: Python slices are [start:end] where end is exclusive.
-# Line 197 in file is index 196? Or 197? 
-# View showed 197 lines. So index 197 is start of line 198.
-c1 = lines[0:197]
-c2 = lines[197:303]
-c3 = lines[303:320]
-c4 = lines[320:366]
-c5 = lines[366:449]
-c6 = lines[449:715]
-c7 = lines[715:764]
-c8 = lines[764:998] # Guessing dispute end around 998 based on file size
-c9 = lines[998:]
-
-# Write base config/mock (Commit 0)
-commit("chore: initial setup")
-run_cmd("git add contracts/mock-nft.clar Clarinet.toml tests/stack-mart-v2.spec.ts.final")
-commit("test: add mock nft and test configuration")
-
-# Commit 1: Core Structures
-with open('contracts/stack-mart.clar', 'w') as f:
-    f.writelines(c1)
-commit("refactor(contract): fix admin duplicates and unify reputation map")
-
-# Commit 2: Auction System
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c2)
-commit("feat(contract): implement auction system with nft trait support")
-
-# Commit 3: Bundle Maps
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c3)
-commit("feat(contract): add bundle and pack data structures")
-
-# Commit 4: Getters
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c4)
-commit("feat(contract): add reputation and listing getters")
-
-# Commit 5: Legacy Functions
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c5)
-commit("refactor(contract): preserve legacy listing and buy-listing functions")
-
-# Commit 6: Escrow Functions
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c6)
-commit("fix(contract): secure escrow flows with as-contract stx transfers")
-
-# Commit 7: Helpers
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c7)
-commit("refactor(contract): update reputation helpers and transaction logging")
-
-# Commit 8: Disputes
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c8)
-commit("feat(contract): implement dispute resolution with stake claims")
-
-# Commit 9: Bundles Logic
-with open('contracts/stack-mart.clar', 'a') as f:
-    f.writelines(c9)
-commit("feat(contract): implement buy-bundle with batched escrow creation")
-
-# Commit 10: Tests
-run_cmd("mv tests/stack-mart-v2.spec.ts.final tests/stack-mart-v2.spec.ts")
-commit("test: add comprehensive tests for auctions and bundles")
-
-print("Granular commits generated successfully.")
+    with phase("stage"):
+        run_cmd("git add .")
+    with phase("commit"):
+        try:
+            run_cmd(f"git commit -m '{msg}'")
+        except:
+            print(f"Nothing to commit for: {msg}")
+
+def append_chunk(chunk, mode='a'):
+    with phase("write"):
+        with open('contracts/stack-mart.clar', mode) as f:
+            f.writelines(chunk)
+
+def section_ends(lines, ranges):
+    """Byte offset in the source where each section prefix ends"""
+    line_ends = [0]
+    for line in lines:
+        line_ends.append(line_ends[-1] + len(line.encode()))
+    return [line_ends[end] for _, end in ranges]
+
+def read_spec():
+    """The v2 spec to split: the .final copy when there is one, else the spec in the tree"""
+    for path in (TEST_SOURCE_PATH, TEST_PATH):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return f.read()
+    return None
+
+def section_spec_cuts(boundaries, ranges, test_data):
+    """Spec byte ranges at each section commit, so test blocks land with the section defining what they call
+
+    Returns ({section index: ranges}, blocks placed, blocks), as spec_cuts does.
+    """
+    starts = [start for start, _ in ranges]
+    step_of = {b.name: bisect_right(starts, b.start) - 1 for b in boundaries if b.name}
+    return spec_cuts(test_data, step_of)
+
+def test_step_needed(test_data, placed, blocks):
+    """Whether the whole spec still needs its own commit after the section commits"""
+    return test_data is not None and (placed < blocks or not placed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stack-mart.clar.final as named commits")
+    parser.add_argument("--fast-import", action="store_true",
+                        help="import the section commits with git fast-import, reusing cached ones")
+    parser.add_argument("--branch", help="branch to write with --fast-import (default: current branch)")
+    parser.add_argument("--strict", action="store_true",
+                        help="refuse to commit if any section prefix is not well formed")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
+    # Read final content and its section index (cached next to the file)
+    with phase("read"):
+        lines, boundaries = load_boundaries(SOURCE_PATH)
+    count("files_scanned")
+
+    # Each commit starts at a ;; banner title or definition name and runs up to
+    # the next one, so edits to the contract never need new line numbers
+    with phase("split"):
+        ranges = section_ranges(boundaries, [anchor for anchor, _ in SECTIONS], len(lines))
+
+    # Check every section prefix before anything is committed
+    with phase("verify"):
+        problems = check_prefixes("".join(lines).encode(), section_ends(lines, ranges),
+                                  {b.name for b in boundaries if b.name}, [msg for _, msg in SECTIONS])
+    for line in problems:
+        print(line)
+    if problems and args.strict:
+        sys.exit(f"{len(problems)} problems in the section prefixes; nothing was committed")
+
+    # Spec blocks ride along with the section that defines every name they call
+    test_data = read_spec()
+    with phase("split"):
+        cuts, placed, blocks = section_spec_cuts(boundaries, ranges, test_data) if test_data else ({}, 0, 0)
+    if blocks:
+        print(f"Test blocks committed with their sections: {placed}/{blocks}")
+
+    if args.fast_import:
+        # Section commits only; the working tree and index are left alone
+        branch = args.branch or current_branch()
+        cache = CommitCache.load()
+        base = cache.base_for(resolve_commit(branch) or resolve_commit("HEAD"))
+        steps = []
+        for i, ((_, end), (_, msg)) in enumerate(zip(ranges, SECTIONS)):
+            contract = "".join(lines[:end]).encode()
+            if i in cuts:
+                steps.append((msg, {'contracts/stack-mart.clar': contract,
+                                    TEST_PATH: join_ranges(test_data, cuts[i])}, None))
+            else:
+                steps.append((msg, 'contracts/stack-mart.clar', contract))
+        if test_step_needed(test_data, placed, blocks):
+            steps.append((TEST_MESSAGE, TEST_PATH, test_data))
+        reused, imported = import_series(cache, branch, base, steps)
+        print(f"Reused {reused} and imported {imported} commits onto {branch}.")
+        return
+
+    # Write base config/mock (Commit 0)
+    commit("chore: initial setup")
+    run_cmd("git add contracts/mock-nft.clar Clarinet.toml tests/stack-mart-v2.spec.ts.final")
+    commit("test: add mock nft and test configuration")
+
+    # Commits 1-9: one per section, with the spec blocks it makes runnable
+    for i, ((start, end), (_, msg)) in enumerate(zip(ranges, SECTIONS)):
+        append_chunk(lines[start:end], 'w' if start == 0 else 'a')
+        if i in cuts:
+            with phase("write"):
+                with open(TEST_PATH, 'wb') as f:
+                    f.write(join_ranges(test_data, cuts[i]))
+        commit(msg)
+
+    # Commit 10: Tests
+    if os.path.exists(TEST_SOURCE_PATH):
+        run_cmd("mv tests/stack-mart-v2.spec.ts.final tests/stack-mart-v2.spec.ts")
+    elif test_data is not None:
+        with open(TEST_PATH, 'wb') as f:
+            f.write(test_data)
+    commit(TEST_MESSAGE)
+
+    print("Granular commits generated successfully.")
+
+if __name__ == "__main__":
+    main()
@@ -1,88 +1,289 @@
+import argparse
 import os
-import re
 import subprocess
 
+from clarity_scan import header_end, open_contract, scan_definitions
+from clarity_symbols import SymbolIndex
+from clarity_validate import check_prefixes
+from commit_cache import DEFAULT_MAX_ENTRIES, CommitCache, import_series, step_changes
+from commit_pipeline import pipeline_import
+from commit_schedule import Group, commit_count, group_message, schedule
+from fast_import import current_branch, git_output, resolve_commit
+from gen_journal import Journal
+from gen_trace import add_trace_arguments, count, enable_from_args, phase
+from git_session import isolated_index, worktree
+from spec_index import join_ranges, spec_cuts
+
+CONTRACT_PATH = "contracts/stack-mart.clar"
+TEST_PATH = "tests/stack-mart.spec.ts"
+
 def run_cmd(cmd):
     subprocess.check_call(cmd, shell=True)
 
 def git_commit(msg):
-    run_cmd("git add .")
+    with phase("stage"):
+        run_cmd("git add .")
     # allow empty if nothing changed
-    try:
-        run_cmd(f"git commit -m '{msg}'")
-    except subprocess.CalledProcessError:
-        pass
+    with phase("commit"):
+        try:
+            run_cmd(f"git commit -m '{msg}'")
+        except subprocess.CalledProcessError:
+            pass
+
+def validate_series(content, definitions, messages, ends, strict=False):
+    """Check every prefix before the first commit is written
+
+    Problems are printed; with strict they also stop the run.
+    """
+    with phase("verify"):
+        problems = check_prefixes(content, ends, {d.name for d in definitions}, messages)
+    for line in problems:
+        print(line)
+    if problems and strict:
+        raise SystemExit(f"{len(problems)} problems in the generated prefixes; nothing was committed")
+
+def plan_series(content, test_data, commits=None, by="bytes"):
+    """Messages, contract end offsets and spec cuts of every step before the tests
+
+    One step per definition, or with commits, that many steps of balanced
+    size (see commit_schedule.py). Returns (definitions, messages, ends,
+    {step: spec ranges}, spec blocks placed, spec blocks).
+    """
+    definitions = scan_definitions(content)
+    symbols = SymbolIndex(content, definitions)
+    if commits:
+        groups, notes = schedule(content, definitions, commits, by, symbols)
+        for note in notes:
+            print(f"⚠️  {note}")
+    else:
+        groups = [Group(i, i + 1, None) for i in range(len(definitions) + 1)]
+    item_ends = [header_end(definitions, len(content))] + [d.end for d in definitions]
+    messages = [group_message(symbols, group) for group in groups]
+    ends = [item_ends[group.last - 1] for group in groups]
+    step_of = [step for step, group in enumerate(groups) for _ in range(max(group.first, 1), group.last)]
+    return (definitions, messages, ends) + spec_cuts(test_data, {d.name: step for d, step in zip(definitions, step_of)})
+
+def iter_steps(content, test_content, base, strict=False, commits=None, by="bytes"):
+    """Yield (message, path, data) for every commit in the series, sliced from content
+
+    Steps that also bring in test blocks are (message, {path: data}, None).
+    """
+    test_data = test_content.encode()
+    with phase("split"):
+        definitions, messages, ends, cuts, placed, blocks = plan_series(content, test_data, commits, by)
 
-def main():
-    # Read the final contract content
-    with open("contracts/stack-mart.clar", "r") as f:
-        content = f.read()
-
-    # Read the final test content
-    with open("tests/stack-mart.spec.ts", "r") as f:
-        test_content = f.read()
-
-    # Back up files
-    with open("contracts/stack-mart.clar.bak", "w") as f:
-        f.write(content)
-    with open("tests/stack-mart.spec.ts.bak", "w") as f:
-        f.write(test_content)
-
-    # Empty the file first
-    with open("contracts/stack-mart.clar", "w") as f:
-        f.write(";; StackMart Initial\n")
-    
-    # Regular expression to split by top-level definitions
-    # Matches (define- at start of line
-    chunks = re.split(r'(?=^\(define-)', content, flags=re.MULTILINE)
-    
-    header = chunks[0]
-    definitions = chunks[1:]
-    
     print(f"Total definitions found: {len(definitions)}")
-    
-    # Apply header
-    with open("contracts/stack-mart.clar", "w") as f:
-        f.write(header)
-    git_commit("feat: initial contract structure and constants")
-    
-    # Apply definitions
-    current_content = header
-    for i, chunk in enumerate(definitions):
-        current_content += chunk
-        
-        # Determine commit message from chunk type
-        msg = "feat: update contract logic"
-        if "define-trait" in chunk:
-            msg = "feat: add sip-009 nft trait definition"
-        elif "define-map" in chunk:
-            map_name = re.search(r'define-map\s+([a-z0-9-]+)', chunk)
-            name = map_name.group(1) if map_name else "data"
-            msg = f"feat: add {name} map structure"
-        elif "define-public" in chunk:
-            func_name = re.search(r'define-public\s+\(([a-z0-9-]+)', chunk)
-            name = func_name.group(1) if func_name else "function"
-            msg = f"feat: implement {name} public function"
-        elif "define-read-only" in chunk:
-            func_name = re.search(r'define-read-only\s+\(([a-z0-9-]+)', chunk)
-            name = func_name.group(1) if func_name else "getter"
-            msg = f"feat: add {name} read-only helper"
-        elif "define-data-var" in chunk:
-            var_name = re.search(r'define-data-var\s+([a-z0-9-]+)', chunk)
-            name = var_name.group(1) if var_name else "variable"
-            msg = f"feat: add {name} state variable"
-            
+    print(f"Test blocks committed with their definitions: {placed}/{blocks}")
+    validate_series(content, definitions, messages, ends, strict)
+
+    view = memoryview(content)
+    for i, (msg, end) in enumerate(zip(messages, ends)):
+        if i in cuts:
+            yield msg, {CONTRACT_PATH: view[:end], TEST_PATH: join_ranges(test_data, cuts[i])}, None
+        else:
+            yield msg, CONTRACT_PATH, view[:end]
+
+    # Blocks that call no definition come last; without any placed blocks the
+    # test file only needs its own commit if it differs from the base
+    if placed:
+        test_changed = placed < blocks
+    else:
+        with phase("verify"):
+            test_changed = base is None or subprocess.run(
+                ["git", "diff", "--quiet", base, "--", TEST_PATH]
+            ).returncode != 0
+    if test_changed:
+        yield ("test: add comprehensive test suite including like system",
+               TEST_PATH, test_data)
+
+def fast_import_main(content, test_content, branch, base=None, cache_size=DEFAULT_MAX_ENTRIES,
+                     pipeline=False, strict=False, commits=None, by="bytes"):
+    """Write the same commit series as main() through one fast-import stream
+
+    Commits already produced by an earlier run for the same base and
+    content are reused from the cache; only later steps are imported.
+    With pipeline, hashing the next prefixes overlaps with importing.
+    """
+    cache = CommitCache.load(cache_size)
+    # A new branch starts from HEAD so it keeps the rest of the tree; a branch
+    # written by an earlier run is rebuilt from the base that run used
+    base = base or cache.base_for(resolve_commit(branch) or resolve_commit("HEAD"))
+    steps = iter_steps(content, test_content, base, strict, commits, by)
+    if pipeline:
+        reused, imported = pipeline_import(cache, branch, base, steps)
+    else:
+        reused, imported = import_series(cache, branch, base, list(steps))
+    print(f"Success: Reused {reused} and imported {imported} commits onto {branch}.")
+
+def store_inputs():
+    """Write the original contract and tests to the object store for the journal"""
+    return git_output(["hash-object", "-w", CONTRACT_PATH]), git_output(["hash-object", "-w", TEST_PATH])
+
+def read_inputs(journal):
+    """The inputs an interrupted run started from; the working copies may be truncated"""
+    blobs = [subprocess.run(["git", "cat-file", "blob", journal.plan[key]],
+                            capture_output=True, check=True).stdout
+             for key in ("contract_blob", "test_blob")]
+    return memoryview(blobs[0]), blobs[1].decode()
+
+def begin_steps(journal, ref, base, inputs, steps):
+    """Journal the plan and return the index of the first step to run"""
+    if journal is None:
+        return 0
+    plan = [(msg, {p: len(d) for p, d in step_changes(path, data).items()}) for msg, path, data in steps]
+    start = journal.begin(ref, base, *inputs, plan)
+    if start:
+        print(f"⏩ Resuming after step {start} of {len(steps)} from {journal.path}")
+    return start
+
+def isolated_main(content, test_content, branch, base, strict=False, journal=None, inputs=None,
+                  commits=None, by="bytes"):
+    """Commit the series onto branch through a private index
+
+    Neither the shared index nor the working tree is touched, so several
+    jobs can run in one checkout as long as they target different branches.
+    """
+    steps = list(iter_steps(content, test_content, base, strict, commits, by))
+    start = begin_steps(journal, f"refs/heads/{branch}", base, inputs, steps)
+    committed = 0
+    with isolated_index(resolve_commit(branch) if start else base) as session:
+        for i, (msg, path, data) in enumerate(steps[start:], start):
+            session.stage_content(step_changes(path, data))
+            if session.commit_index(msg, branch):
+                committed += 1
+            if journal:
+                journal.record(i, session.head)
+    if journal:
+        journal.finish()
+    print(f"Success: Committed {committed} commits onto {branch}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stack-mart.clar as one commit per definition")
+    parser.add_argument("--fast-import", action="store_true",
+                        help="build the history with git fast-import without touching the working tree or index")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="with --fast-import, overlap chunking, hashing and importing (asyncio)")
+    parser.add_argument("--isolated", action="store_true",
+                        help="commit through a private index (GIT_INDEX_FILE) without touching the working tree")
+    parser.add_argument("--worktree", action="store_true",
+                        help="run the file-writing loop in a throwaway git worktree on --branch")
+    parser.add_argument("--branch", help="branch to write with --fast-import, --isolated or --worktree "
+                                         "(default: current branch)")
+    parser.add_argument("--base", help="commit the generated history starts from (default: branch tip or HEAD)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="max cached steps kept for incremental --fast-import runs")
+    parser.add_argument("--strict", action="store_true",
+                        help="refuse to commit if any generated prefix is not well formed")
+    parser.add_argument("--commits", type=commit_count,
+                        help="group the definitions into this many commits of balanced size "
+                             "(default: one commit per definition)")
+    parser.add_argument("--by", choices=("bytes", "lines"), default="bytes",
+                        help="what --commits balances")
+    parser.add_argument("--restart", action="store_true",
+                        help="discard the journal of an interrupted run and start again from its base")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+    if args.worktree and not args.branch:
+        parser.error("--worktree needs --branch (the current branch is already checked out here)")
+    if args.pipeline and not args.fast_import:
+        parser.error("--pipeline only applies to --fast-import")
+    enable_from_args(args)
+
+    with phase("read"):
+        # Map the final contract content; prefixes are sliced from this buffer
+        content = open_contract(CONTRACT_PATH)
+
+        # Read the final test content
+        with open(TEST_PATH, "r") as f:
+            test_content = f.read()
+    count("files_scanned", 2)
+
+    if args.fast_import:
+        base = resolve_commit(args.base) if args.base else None
+        fast_import_main(content, test_content, args.branch or current_branch(), base, args.cache_size,
+                         args.pipeline, args.strict, args.commits, args.by)
+        return
+
+    if args.worktree:
+        branch = args.branch
+        base = resolve_commit(args.base or branch) or resolve_commit("HEAD")
+        # The worktree has its own index and files; replay the loop inside it
+        content = memoryview(content.tobytes())
+        with worktree(branch, base) as path:
+            os.chdir(path)
+            legacy_main(content, test_content, args.strict, commits=args.commits, by=args.by)
+        return
+
+    # The working-tree and isolated loops commit one step at a time; journal
+    # them so an interrupted run picks up where it stopped. Each target ref
+    # has its own journal, so concurrent isolated jobs stay independent
+    branch = (args.branch or current_branch()) if args.isolated else None
+    journal = Journal.load(f"refs/heads/{branch}" if args.isolated else "HEAD")
+    restart_base = None
+    if args.restart and journal.interrupted:
+        # Start over from where the interrupted run started, not on top of its partial commits
+        restart_base = journal.plan["base"]
+        journal.reset()
+    resuming = journal.interrupted
+    if resuming:
+        content, test_content = read_inputs(journal)
+        inputs = (journal.plan["contract_blob"], journal.plan["test_blob"])
+    else:
+        inputs = store_inputs()
+
+    if args.isolated:
+        if resuming:
+            base = journal.plan["base"]
+        elif restart_base and not args.base:
+            base = restart_base
+        else:
+            base = resolve_commit(args.base or branch) or resolve_commit("HEAD")
+        isolated_main(content, test_content, branch, base, args.strict, journal, inputs, args.commits, args.by)
+        return
+
+    # The contract file is rewritten below, so detach from the mapping first
+    content = memoryview(content.tobytes())
+    legacy_main(content, test_content, args.strict, journal, inputs, args.commits, args.by)
+
+def legacy_main(content, test_content, strict=False, journal=None, inputs=None, commits=None, by="bytes"):
+    """Rewrite the contract in the working tree and commit each prefix
+
+    With a journal, each step's resulting HEAD is recorded before the next
+    one starts, and a rerun after a crash continues from the last of them.
+    """
+    # Paren- and string-aware split, validated before anything is written
+    steps = list(iter_steps(content, test_content, None, strict, commits, by))
+    start = begin_steps(journal, "HEAD", resolve_commit("HEAD"), inputs, steps)
+
+    # Back up files; a resumed run has its inputs from the journal, so these
+    # are never the truncated copies an interrupted run left behind
+    with phase("write"):
+        with open("contracts/stack-mart.clar.bak", "wb") as f:
+            f.write(content)
+        with open("tests/stack-mart.spec.ts.bak", "w") as f:
+            f.write(test_content)
+
+        if start == 0:
+            # Empty the file first
+            with open(CONTRACT_PATH, "w") as f:
+                f.write(";; StackMart Initial\n")
+
+    # Header, one prefix per definition, then the tests
+    for i, (msg, path, data) in enumerate(steps[start:], start):
         # Write and commit
-        with open("contracts/stack-mart.clar", "w") as f:
-            f.write(current_content)
-            
+        for file_path, file_data in step_changes(path, data).items():
+            with phase("write"):
+                with open(file_path, "wb") as f:
+                    f.write(file_data)
+            # git add re-hashes the whole rewritten file
+            count("bytes_hashed", len(file_data))
+
         git_commit(msg)
-        
-    # Then add tests
-    with open("tests/stack-mart.spec.ts", "w") as f:
-        f.write(test_content)
-    git_commit("test: add comprehensive test suite including like system")
-    
+        if journal:
+            journal.record(i, resolve_commit("HEAD"))
+
+    if journal:
+        journal.finish()
     print("Success: Generated commits.")
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Long-lived git helper processes for the commit generators
+Avoids one fork/exec (and one index load) per file and per query
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import gen_trace
+
+GitObject = namedtuple("GitObject", ["oid", "type", "content"])
+
+
+class GitSession:
+    """Keep `git cat-file --batch` and `git hash-object --stdin-paths` running
+
+    Staging goes through one `git update-index --stdin` per file list:
+    update-index only writes the index when its input ends, so a whole
+    list is staged in a single round trip rather than one process per file.
+    """
+
+    def __init__(self, cwd=None, env=None, index_file=None):
+        self.cwd = cwd
+        self.env = dict(os.environ if env is None else env, GIT_FLUSH="1")
+        if index_file:
+            # A private index lets several jobs stage and commit at once
+            self.env["GIT_INDEX_FILE"] = index_file
+        self.head = None
+        self._branches = set()
+        self._scratch = None
+        self._cat_file = None
+        self._hash_object = None
+
+    def _spawn(self, args, text=False):
+        return subprocess.Popen(
+            ["git"] + args, cwd=self.cwd, env=self.env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=text
+        )
+
+    def run(self, args, check=True, input=None, text=True):
+        """Run a one-off git command and return its CompletedProcess (bytes output with text=False)"""
+        return subprocess.run(
+            ["git"] + args, cwd=self.cwd, env=self.env, input=input,
+            capture_output=True, text=text, check=check
+        )
+
+    def hash_paths(self, paths):
+        """Write files to the object store, returning their blob ids in order"""
+        if self._hash_object is None:
+            self._hash_object = self._spawn(["hash-object", "-w", "--stdin-paths"], text=True)
+        proc = self._hash_object
+        gen_trace.count("files_scanned", len(paths))
+        # Write from a thread so a long list cannot fill both pipes and deadlock
+        writer = threading.Thread(target=self._feed, args=(proc, "".join(f"{p}\n" for p in paths)))
+        writer.start()
+        ids = [proc.stdout.readline().strip() for _ in paths]
+        writer.join()
+        return ids
+
+    @staticmethod
+    def _feed(proc, data):
+        proc.stdin.write(data)
+        proc.stdin.flush()
+
+    def cat_file(self, rev):
+        """Return a GitObject for rev, or None if it does not exist"""
+        if self._cat_file is None:
+            self._cat_file = self._spawn(["cat-file", "--batch"])
+        proc = self._cat_file
+        proc.stdin.write(f"{rev}\n".encode())
+        proc.stdin.flush()
+        header = proc.stdout.readline().decode().split()
+        if len(header) != 3:
+            # "<rev> missing" or "<rev> ambiguous"
+            return None
+        oid, obj_type, size = header
+        content = proc.stdout.read(int(size))
+        proc.stdout.read(1)  # trailing newline
+        return GitObject(oid, obj_type, content)
+
+    def stage(self, paths):
+        """Stage a list of paths (additions, changes and deletions) in one update-index"""
+        if not paths:
+            return
+        gen_trace.count("files_scanned", len(paths))
+        with gen_trace.phase("stage", files=len(paths)):
+            self.run(["update-index", "--add", "--remove", "-z", "--stdin"],
+                     input="".join(f"{p}\0" for p in paths))
+
+    def write_blobs(self, contents):
+        """Write a list of bytes to the object store, returning their blob ids in order"""
+        if self._scratch is None:
+            self._scratch = tempfile.mkdtemp(prefix="git-session-")
+        scratch_paths = []
+        for i, data in enumerate(contents):
+            scratch_path = os.path.join(self._scratch, str(i))
+            with open(scratch_path, "wb") as f:
+                f.write(data)
+            scratch_paths.append(scratch_path)
+        return self.hash_paths(scratch_paths)
+
+    def stage_blobs(self, blobs, modes=None):
+        """Stage {path: blob id} in one update-index; a value of None removes the path
+
+        modes maps a path to its git file mode ("100755", "120000"); paths
+        not in it are staged as regular files.
+        """
+        modes = modes or {}
+        entries = "".join(
+            f"0 {'0' * 40}\t{path}\n" if oid is None else f"{modes.get(path, '100644')} {oid}\t{path}\n"
+            for path, oid in blobs.items()
+        )
+        with gen_trace.phase("stage", files=len(blobs)):
+            self.run(["update-index", "--add", "--index-info"], input=entries)
+
+    def stage_content(self, files, modes=None):
+        """Stage {path: bytes} without writing the paths into the working tree
+
+        A value of None removes the path from the index; modes is as for stage_blobs.
+        """
+        ids = iter(self.write_blobs([data for data in files.values() if data is not None]))
+        self.stage_blobs({path: None if data is None else next(ids) for path, data in files.items()}, modes)
+
+    def commit_index(self, message, branch):
+        """Commit the index onto branch with write-tree/commit-tree/update-ref
+
+        Returns the new commit id, or None when the tree did not change.
+        """
+        with gen_trace.phase("commit"):
+            tree = self.run(["write-tree"]).stdout.strip()
+            parent_tree = self.cat_file(f"{self.head}^{{tree}}").oid if self.head else None
+            if tree == parent_tree:
+                return None
+            parents = ["-p", self.head] if self.head else []
+            commit = self.run(["commit-tree", tree] + parents, input=message).stdout.strip()
+            # The first commit resets the branch onto head; later ones must fast-forward
+            expected = [self.head] if branch in self._branches else []
+            self.run(["update-ref", f"refs/heads/{branch}", commit] + expected)
+        self._branches.add(branch)
+        self.head = commit
+        return commit
+
+    def stage_all(self):
+        with gen_trace.phase("stage"):
+            self.run(["add", "-A"])
+
+    def commit(self, message):
+        """Commit the index; returns False when there was nothing to commit"""
+        with gen_trace.phase("commit"):
+            result = self.run(["commit", "-q", "-m", message], check=False)
+        return result.returncode == 0
+
+    def log(self, count=5, rev="HEAD"):
+        """Return "<short id> <subject>" lines by walking commits through cat-file"""
+        lines = []
+        with gen_trace.phase("verify"):
+            obj = self.cat_file(rev)
+            while obj and len(lines) < count:
+                headers, _, message = obj.content.decode().partition("\n\n")
+                lines.append(f"{obj.oid[:7]} {message.splitlines()[0] if message else ''}")
+                parents = [h.split()[1] for h in headers.splitlines() if h.startswith("parent ")]
+                if not parents:
+                    break
+                obj = self.cat_file(parents[0])
+        return lines
+
+    def close(self):
+        for proc in (self._cat_file, self._hash_object):
+            if proc is not None:
+                proc.stdin.close()
+                proc.wait()
+        self._cat_file = self._hash_object = None
+        if self._scratch:
+            shutil.rmtree(self._scratch, ignore_errors=True)
+            self._scratch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+@contextmanager
+def isolated_index(base, cwd=None):
+    """Yield a GitSession with its own GIT_INDEX_FILE seeded from base
+
+    Nothing touches the shared index or working tree, so generation jobs
+    for different branches can run side by side without index.lock waits.
+    """
+    tmp = tempfile.mkdtemp(prefix="git-index-")
+    session = GitSession(cwd=cwd, index_file=os.path.join(tmp, "index"))
+    try:
+        if base:
+            session.run(["read-tree", base])
+        session.head = base
+        yield session
+    finally:
+        session.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@contextmanager
+def worktree(branch, base, cwd=None):
+    """Yield the path of a throwaway `git worktree` checked out on a new branch
+
+    For jobs that need real files on disk (shell scripts, git add -A flows);
+    the worktree has its own index and HEAD, separate from the main checkout.
+    """
+    path = tempfile.mkdtemp(prefix="git-worktree-")
+    subprocess.run(["git", "worktree", "add", "-q", "-B", branch, path, base],
+                   cwd=cwd, check=True)
+    try:
+        yield path
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", path], cwd=cwd)
+        shutil.rmtree(path, ignore_errors=True)
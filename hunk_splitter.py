@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Split one working-tree diff into a series of commits
+Parses `git diff -U0` once and builds each commit in a private index
+"""
+
+import os
+import re
+import stat
+from collections import namedtuple
+
+from clarity_sections import build_boundaries
+from git_session import isolated_index
+
+# old_start/new_start are 1-based; with a count of 0 they name the line the
+# change sits after, as in the @@ header
+Hunk = namedtuple("Hunk", ["path", "old_start", "old_count", "new_start", "new_count", "removed", "added"])
+# mode: the file's git mode after the change ("100644", "100755", "120000"), None once deleted
+FileDiff = namedtuple("FileDiff", ["path", "new_file", "deleted", "binary", "hunks", "mode"])
+
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+WORD = re.compile(r'[A-Za-z_][A-Za-z0-9_?!-]*')
+
+
+def split_lines(text):
+    """Split text after every newline, keeping it; git counts only \\n as a line break
+
+    str.splitlines also breaks on \\f, \\v, \\r, \\x1c-\\x1e, \\x85 and
+    U+2028, which would throw the @@ line numbers off.
+    """
+    lines = text.split("\n")
+    tail = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if tail:
+        lines.append(tail)
+    return lines
+
+
+def parse_diff(text):
+    """Parse `git diff -U0` output into FileDiffs"""
+    files = []
+    current = None
+    lines = split_lines(text)
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("diff --git "):
+            path = line.rstrip("\n").split(" b/", 1)[1]
+            current = FileDiff(path, False, False, False, [], None)
+            files.append(current)
+        elif current is None:
+            pass
+        elif line.startswith("new file mode"):
+            current = files[-1] = current._replace(new_file=True, mode=line.split()[-1])
+        elif line.startswith("new mode"):
+            current = files[-1] = current._replace(mode=line.split()[-1])
+        elif line.startswith("index ") and current.mode is None and not current.deleted:
+            # `index <old>..<new> <mode>` names the mode when it did not change
+            fields = line.split()
+            if len(fields) == 3:
+                current = files[-1] = current._replace(mode=fields[2])
+        elif line.startswith("deleted file mode"):
+            current = files[-1] = current._replace(deleted=True)
+        elif line.startswith("Binary files "):
+            current = files[-1] = current._replace(binary=True)
+        elif line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            old_start, old_count, new_start, new_count = (
+                int(match.group(1)), int(match.group(2) or 1), int(match.group(3)), int(match.group(4) or 1)
+            )
+            removed, added = [], []
+            i += 1
+            while i < len(lines) and lines[i][:1] in ("-", "+", "\\"):
+                body = lines[i]
+                if body.startswith("\\"):
+                    # "\ No newline at end of file" applies to the line before it
+                    target = added if lines[i - 1].startswith("+") else removed
+                    target[-1] = target[-1].rstrip("\n")
+                elif body.startswith("-"):
+                    removed.append(body[1:])
+                else:
+                    added.append(body[1:])
+                i += 1
+            current.hunks.extend(split_insertions(
+                Hunk(current.path, old_start, old_count, new_start, new_count, tuple(removed), tuple(added))
+            ))
+            continue
+        i += 1
+    return files
+
+
+def split_insertions(hunk):
+    """Cut a pure insertion of several Clarity definitions into one hunk per definition
+
+    -U0 merges adjacent new definitions into one hunk; the pieces keep the
+    same old_start and stay in order, so any subset still applies cleanly.
+    """
+    if hunk.old_count or not hunk.path.endswith(".clar"):
+        return [hunk]
+    cuts = [0]
+    for i, line in enumerate(hunk.added):
+        if i and line.startswith("(define-"):
+            start = i
+            # Leading ;; comments belong to the definition below them
+            while start > cuts[-1] and hunk.added[start - 1].startswith(";;"):
+                start -= 1
+            if start > cuts[-1]:
+                cuts.append(start)
+    pieces = []
+    for start, end in zip(cuts, cuts[1:] + [len(hunk.added)]):
+        added = hunk.added[start:end]
+        pieces.append(hunk._replace(new_start=hunk.new_start + start, new_count=len(added), added=added))
+    return pieces
+
+
+def apply_hunks(old_lines, hunks):
+    """Apply a subset of one file's -U0 hunks to its old lines"""
+    out = []
+    pos = 0
+    for hunk in sorted(hunks, key=lambda h: h.old_start):
+        # A pure insertion sits after old_start; otherwise old_start is replaced
+        start = hunk.old_start if hunk.old_count == 0 else hunk.old_start - 1
+        out.extend(old_lines[pos:start])
+        out.extend(hunk.added)
+        pos = start + hunk.old_count
+    out.extend(old_lines[pos:])
+    return out
+
+
+def _message_names(message):
+    return set(WORD.findall(message))
+
+
+def _enclosing(boundaries, line_number):
+    """Name of the definition whose line range holds the 1-based line_number"""
+    for boundary in boundaries:
+        if boundary.start < line_number <= boundary.end:
+            return boundary.name
+    return ""
+
+
+def assign_hunks(files, old_contents, new_contents, commits):
+    """Map each hunk to the index of the commit whose message names what it touches
+
+    commits is a list of (message, paths). A hunk scores 2 when the message
+    names the definition around it and 1 for each defined name it adds or
+    removes; ties go to the earliest message. Hunks that match nothing follow
+    the previous hunk in the file, else the first commit listing the path.
+    """
+    message_names = [_message_names(message) for message, _ in commits]
+    assignment = {}
+    for diff in files:
+        listed = [i for i, (_, paths) in enumerate(commits) if diff.path in paths]
+        fallback = listed[0] if listed else len(commits) - 1
+        if not diff.path.endswith(".clar"):
+            for hunk in diff.hunks:
+                assignment[hunk] = fallback
+            continue
+        new_bounds = build_boundaries(new_contents.get(diff.path, []))
+        old_bounds = build_boundaries(old_contents.get(diff.path, []))
+        defined = {b.name for b in new_bounds + old_bounds if b.name}
+        previous = None
+        for hunk in diff.hunks:
+            if hunk.new_count:
+                around = _enclosing(new_bounds, hunk.new_start)
+            else:
+                around = _enclosing(old_bounds, hunk.old_start)
+            touched = defined.intersection(WORD.findall("".join(hunk.removed + hunk.added)))
+            best, best_score = None, 0
+            for i, names in enumerate(message_names):
+                score = (2 if around in names else 0) + len(touched & names)
+                if score > best_score:
+                    best, best_score = i, score
+            if best is None:
+                best = previous if previous is not None else fallback
+            assignment[hunk] = previous = best
+    return assignment
+
+
+def plan_split(commits, session, base="HEAD"):
+    """Work out every commit's changed files without committing anything
+
+    The diff is parsed once; each commit's content is rebuilt from the base
+    blobs plus the hunks assigned so far. Returns (base commit id,
+    [(message, {path: bytes or None for a deletion})], {path: git mode});
+    messages that got no hunks have an empty dict. A rename is split as a
+    deletion plus an addition.
+    """
+    base = session.run(["rev-parse", base]).stdout.strip()
+    # Read as bytes: text mode would turn \r and \r\n in the patch into \n
+    diff = session.run(["diff", "-U0", "--no-color", "--no-ext-diff", "--no-renames", base], text=False).stdout
+    files = parse_diff(diff.decode())
+    tracked = {diff.path for diff in files}
+    # Untracked files are not in git diff; treat each as a whole-file addition
+    for path in session.run(["ls-files", "--others", "--exclude-standard"]).stdout.splitlines():
+        if path not in tracked:
+            files.append(FileDiff(path, True, False, True, [], _worktree_mode(session.cwd, path)))
+    modes = {diff.path: diff.mode for diff in files if diff.mode}
+    # Binary files, and changes with no hunks (a mode change, an empty file
+    # added or deleted), have nothing to split and land whole
+    files = [diff._replace(binary=True) if not diff.hunks else diff for diff in files]
+
+    old_contents, new_contents = {}, {}
+    for diff in files:
+        if diff.binary:
+            continue
+        obj = None if diff.new_file else session.cat_file(f"{base}:{diff.path}")
+        old_contents[diff.path] = split_lines(obj.content.decode()) if obj else []
+        new_contents[diff.path] = apply_hunks(old_contents[diff.path], diff.hunks)
+
+    assignment = assign_hunks(files, old_contents, new_contents, commits)
+    whole_files = {}
+    for diff in files:
+        if diff.binary:
+            # No hunks to split; the file lands whole with the first commit listing it
+            listed = [i for i, (_, paths) in enumerate(commits) if diff.path in paths]
+            whole_files[diff.path] = listed[0] if listed else len(commits) - 1
+
+    planned = []
+    for position, (message, _) in enumerate(commits):
+        changes = {}
+        for diff in files:
+            if diff.binary:
+                if whole_files[diff.path] == position:
+                    changes[diff.path] = _read_or_none(session.cwd, diff.path)
+                continue
+            mine = [h for h in diff.hunks if assignment[h] == position]
+            if not mine:
+                continue
+            applied = [h for h in diff.hunks if assignment[h] <= position]
+            done = len(applied) == len(diff.hunks)
+            if done and diff.deleted:
+                changes[diff.path] = None
+            else:
+                changes[diff.path] = "".join(apply_hunks(old_contents[diff.path], applied)).encode()
+        planned.append((message, changes))
+    return base, planned, modes
+
+
+def split_commits(commits, branch, session, base="HEAD"):
+    """Commit the working-tree diff against base as len(commits) commits on branch
+
+    Every commit is staged in a private index, so neither the shared index
+    nor the working tree changes. Returns the list of commit ids (None
+    where a message got no hunks).
+    """
+    base, planned, modes = plan_split(commits, session, base)
+    results = []
+    with isolated_index(base, cwd=session.cwd) as index:
+        for message, changes in planned:
+            if changes:
+                index.stage_content(changes, modes)
+            results.append(index.commit_index(message, branch) if changes else None)
+    return results
+
+
+def _read_or_none(cwd, path):
+    full = os.path.join(cwd or ".", path)
+    if os.path.islink(full):
+        # git stores a symlink as its target
+        return os.fsencode(os.readlink(full))
+    if not os.path.exists(full):
+        return None
+    with open(full, "rb") as f:
+        return f.read()
+
+
+def _worktree_mode(cwd, path):
+    """git mode of a working-tree file: symlink, executable or regular"""
+    st = os.lstat(os.path.join(cwd or ".", path))
+    if stat.S_ISLNK(st.st_mode):
+        return "120000"
+    return "100755" if st.st_mode & stat.S_IXUSR else "100644"
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+In-memory line editor for scripted contract changes
+Applies a batch of sed-style and definition-anchored edits to a piece table, then writes the file once
+"""
+
+import argparse
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from itertools import accumulate
+from operator import attrgetter, sub
+
+from clarity_scan import iter_code_tokens
+from clarity_sections import build_boundaries
+
+# buffer: 0 for the file as loaded, 1 for text added since; start/end: byte
+# range in that buffer; newlines: how many the range holds
+Piece = namedtuple("Piece", ["buffer", "start", "end", "newlines"])
+
+INSERT = re.compile(r'(\d+)i\s?(.*)\Z', re.DOTALL)
+ANCHORED = re.compile(r'(after|before)\s+(\S+)\s?(.*)\Z', re.DOTALL)
+RENAME = re.compile(r'rename\s+(\S+)\s+(\S+)\s*\Z')
+WITHIN = re.compile(r'within\s+(\S+)\s+(s.+)\Z', re.DOTALL)
+
+
+class PieceTable:
+    """A document kept as pieces of the loaded bytes and an append-only add buffer
+
+    Edits only split and add pieces, so nothing is copied until text() is
+    asked for. Offsets in the two buffers never move, which is what lets
+    anchors taken before an edit still find their place after it.
+    """
+
+    def __init__(self, data):
+        self.buffers = [bytes(data), bytearray()]
+        self.pieces = [self._piece(0, 0, len(data))] if data else []
+        self.length = len(data)
+        self._text = None
+
+    def _piece(self, buffer, start, end):
+        return Piece(buffer, start, end, self.buffers[buffer].count(b"\n", start, end))
+
+    def __len__(self):
+        return self.length
+
+    def text(self):
+        if self._text is None:
+            self._text = b"".join(self.buffers[p.buffer][p.start:p.end] for p in self.pieces)
+        return self._text
+
+    def add(self, text):
+        """Append text to the add buffer and return its (start, end) there
+
+        A separator byte follows every addition, so the end of one insert
+        is never the start of the next and anchors stay unambiguous.
+        """
+        added = self.buffers[1]
+        start = len(added)
+        added += text
+        end = len(added)
+        added += b"\0"
+        return start, end
+
+    def _offsets(self, field=None):
+        """Running document offsets (or newline counts) at the start of every piece, plus the total"""
+        if field:
+            sizes = map(attrgetter(field), self.pieces)
+        else:
+            sizes = map(sub, map(attrgetter("end"), self.pieces), map(attrgetter("start"), self.pieces))
+        return list(accumulate(sizes, initial=0))
+
+    def _split(self, starts, offset):
+        """Make offset a piece boundary and return the index of the piece starting there"""
+        i = bisect_right(starts, offset) - 1
+        if i == len(self.pieces) or starts[i] == offset:
+            return i
+        piece = self.pieces[i]
+        cut = piece.start + offset - starts[i]
+        left = self._piece(piece.buffer, piece.start, cut)
+        self.pieces[i:i + 1] = [left, Piece(piece.buffer, cut, piece.end, piece.newlines - left.newlines)]
+        return i + 1
+
+    def splice(self, edits):
+        """Replace sorted, non-overlapping (start, end, text) ranges of the document
+
+        Edits are applied back to front, so the offsets of the ones still to
+        do never move; each costs a bisect and a list splice, not a copy of
+        the document.
+        """
+        starts = self._offsets()
+        for start, end, text in reversed(edits):
+            if not 0 <= start <= end <= starts[-1]:
+                raise ValueError(f"edit {start}..{end} is outside the document ({starts[-1]} bytes)")
+            last = self._split(starts, end)
+            count = len(self.pieces)
+            first = self._split(starts, start)
+            # Splitting at start adds a piece below last
+            last += len(self.pieces) - count
+            self.pieces[first:last] = [self._piece(1, *self.add(text))] if text else []
+            self.length += len(text) - (end - start)
+        self._text = None
+
+    def line_offset(self, number):
+        """Offset where 1-based line number starts; one past the last line is the end"""
+        lines = self._offsets("newlines")
+        remaining = number - 1
+        i = bisect_left(lines, remaining)
+        if i == len(lines):
+            if remaining == lines[-1] + 1 and not self.text().endswith(b"\n"):
+                return len(self)
+            raise ValueError(f"line {number} is past the end of the document")
+        if i == 0:
+            return 0
+        # The line starts inside piece i - 1, after its (remaining - lines[i - 1])th newline
+        piece = self.pieces[i - 1]
+        buffer = self.buffers[piece.buffer]
+        at = piece.start
+        for _ in range(remaining - lines[i - 1]):
+            at = buffer.index(b"\n", at) + 1
+        return self._offsets()[i - 1] + at - piece.start
+
+    def locate(self, buffer, offset):
+        """Document position of a buffer offset, or None if an edit removed it
+
+        Text inserted at an anchor goes before the piece starting there, so
+        a second insert at the same anchor lands after the first.
+        """
+        pos = 0
+        ends_here = None
+        for piece in self.pieces:
+            if piece.buffer == buffer:
+                if piece.start <= offset < piece.end:
+                    return pos + offset - piece.start
+                if offset == piece.end:
+                    ends_here = pos + offset - piece.start
+            pos += piece.end - piece.start
+        return ends_here
+
+
+class LineEditor:
+    """Load a file once, apply edit batches to it in memory, write it once per commit
+
+    Definitions are anchored when the file is loaded and whenever an edit
+    inserts new ones, so `insert_after("set-admin", ...)` lands after
+    set-admin (and its trailing comments) however many lines earlier edits
+    added or removed above it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.table = PieceTable(f.read())
+        # name -> (buffer, start, end) of the definition's line range
+        self.anchors = {}
+        self._anchor(0, 0, self.table.buffers[0])
+        self.edits = 0
+
+    def _anchor(self, buffer, base, data):
+        try:
+            lines = data.decode().splitlines(keepends=True)
+        except UnicodeDecodeError:
+            return
+        line_ends = [0]
+        for line in lines:
+            line_ends.append(line_ends[-1] + len(line.encode()))
+        for boundary in build_boundaries(lines):
+            if boundary.name:
+                self.anchors[boundary.name] = (buffer, base + line_ends[boundary.start],
+                                               base + line_ends[boundary.end])
+
+    def _insert(self, at, text):
+        text = _line(text)
+        if at and at == len(self.table) and not self.table.text().endswith(b"\n"):
+            text = b"\n" + text
+        start = len(self.table.buffers[1])
+        self.table.splice([(at, at, text)])
+        self._anchor(1, start, text)
+        self.edits += 1
+
+    def insert_line(self, number, text):
+        """Insert text as a new line before 1-based line number of the current document (sed `Ni`)"""
+        self._insert(self.table.line_offset(number), text)
+
+    def insert_after(self, name, text):
+        buffer, _, end = self._find(name)
+        self._insert(self.table.locate(buffer, end), text)
+
+    def insert_before(self, name, text):
+        buffer, start, _ = self._find(name)
+        self._insert(self.table.locate(buffer, start), text)
+
+    def _find(self, name):
+        anchor = self.anchors.get(name)
+        if anchor is None:
+            raise ValueError(f"{self.path} has no definition named {name}")
+        buffer, start, end = anchor
+        if self.table.locate(buffer, start) is None or self.table.locate(buffer, end) is None:
+            raise ValueError(f"the definition of {name} was removed by an earlier edit")
+        return anchor
+
+    def rename(self, old, new):
+        """Rename a symbol everywhere outside strings and comments; returns the number of uses"""
+        old_token, new_token = old.encode(), new.encode()
+        edits = [(offset, offset + len(old_token), new_token)
+                 for offset, token in iter_code_tokens(self.table.text()) if token == old_token]
+        if edits:
+            self.table.splice(edits)
+            if old in self.anchors:
+                self.anchors[new] = self.anchors.pop(old)
+            self.edits += 1
+        return len(edits)
+
+    def substitute(self, pattern, replacement, every=False, within=None):
+        """sed `s`: replace the first match on each line, or every match; returns the count
+
+        within names a definition to confine the matches to, for edits
+        inside a body whose lines repeat elsewhere in the file.
+        """
+        pattern = re.compile(pattern, re.MULTILINE)
+        text = self.table.text()
+        start, end = 0, len(text)
+        if within is not None:
+            buffer, first, last = self._find(within)
+            start, end = self.table.locate(buffer, first), self.table.locate(buffer, last)
+        edits = []
+        line_end = -1
+        for match in pattern.finditer(text, start, end):
+            if match.start() <= line_end:
+                continue
+            if not every:
+                line_end = text.find(b"\n", match.start())
+                line_end = len(text) if line_end == -1 else line_end
+            edits.append((match.start(), match.end(), match.expand(replacement)))
+        if edits:
+            self.table.splice(edits)
+            self.edits += 1
+        return len(edits)
+
+    def apply(self, expression):
+        """Apply one edit expression: `Ni TEXT`, `s/RE/REPL/[g]`, `after|before NAME TEXT`,
+        `within NAME s/RE/REPL/[g]` or `rename OLD NEW`"""
+        if match := WITHIN.match(expression):
+            pattern, replacement, flags = _split_substitution(match.group(2))
+            self.substitute(_basic_regex(pattern), _replacement(replacement), "g" in flags, match.group(1))
+        elif match := INSERT.match(expression):
+            self.insert_line(int(match.group(1)), match.group(2))
+        elif match := ANCHORED.match(expression):
+            insert = self.insert_after if match.group(1) == "after" else self.insert_before
+            insert(match.group(2), match.group(3))
+        elif match := RENAME.match(expression):
+            self.rename(match.group(1), match.group(2))
+        elif expression.startswith("s") and len(expression) > 1:
+            pattern, replacement, flags = _split_substitution(expression)
+            self.substitute(_basic_regex(pattern), _replacement(replacement), every="g" in flags)
+        else:
+            raise ValueError(f"cannot parse edit expression: {expression!r}")
+
+    def save(self):
+        """Write the document back if any edit changed it"""
+        if self.edits:
+            with open(self.path, "wb") as f:
+                f.write(self.table.text())
+        return self.edits
+
+
+def _line(text):
+    data = text.encode() if isinstance(text, str) else bytes(text)
+    return data if data.endswith(b"\n") else data + b"\n"
+
+
+def _split_substitution(expression):
+    """Split s<d>pattern<d>replacement<d>flags on its delimiter, honouring backslash escapes"""
+    delimiter = expression[1]
+    parts, current = [], ""
+    i = 2
+    while i < len(expression):
+        char = expression[i]
+        if char == "\\" and i + 1 < len(expression):
+            pair = expression[i:i + 2]
+            current += delimiter if pair[1] == delimiter else pair
+            i += 2
+            continue
+        if char == delimiter and len(parts) < 2:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+        i += 1
+    if len(parts) != 2:
+        raise ValueError(f"unterminated substitution: {expression!r}")
+    return parts[0], parts[1], current
+
+
+def _basic_regex(pattern):
+    """Translate a POSIX basic regex (sed's default) to a Python bytes regex"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            if escaped in "(){}+?|":
+                # In a basic regex \( \) \{ \} (and GNU's \+ \? \|) are the operators and ( ) { } + ? | literal
+                out.append(escaped)
+            elif escaped.isalnum():
+                out.append("\\" + escaped)
+            else:
+                out.append(re.escape(escaped))
+            i += 2
+            continue
+        if char == "[":
+            end = pattern.find("]", i + 2 if pattern[i + 1:i + 2] in ("]", "^") else i + 1)
+            if end != -1:
+                out.append(pattern[i:end + 1])
+                i = end + 1
+                continue
+        out.append(char if char in ".*^$" else re.escape(char))
+        i += 1
+    return "".join(out).encode()
+
+
+def _replacement(replacement):
+    """Translate a sed replacement (& and \\1) to a re.expand template"""
+    out = []
+    i = 0
+    while i < len(replacement):
+        char = replacement[i]
+        if char == "\\" and i + 1 < len(replacement):
+            escaped = replacement[i + 1]
+            if escaped.isdigit():
+                out.append(f"\\g<{escaped}>")
+            elif escaped == "n":
+                out.append("\\n")
+            else:
+                out.append("\\\\" if escaped == "\\" else escaped)
+            i += 2
+        elif char == "&":
+            out.append("\\g<0>")
+            i += 1
+        else:
+            out.append("\\\\" if char == "\\" else char)
+            i += 1
+    return "".join(out).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply a batch of edits to a file in memory and write it once (replaces chains of sed -i)"
+    )
+    parser.add_argument("path", help="file to edit")
+    parser.add_argument("-e", "--expression", action="append", required=True, dest="expressions",
+                        help="`Ni TEXT`, `s/RE/REPL/[g]`, `after NAME TEXT`, `before NAME TEXT`, "
+                             "`within NAME s/RE/REPL/[g]` or `rename OLD NEW`; applied in order")
+    args = parser.parse_args()
+
+    editor = LineEditor(args.path)
+    try:
+        for expression in args.expressions:
+            editor.apply(expression)
+    except ValueError as e:
+        sys.exit(f"❌ {args.path}: {e}; the file was not changed")
+    editor.save()
+    print(f"✏️  {args.path}: {len(args.expressions)} edits, written once")
+
+
+if __name__ == "__main__":
+    main()
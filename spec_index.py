@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Block index for vitest spec files
+Splits a spec into describe/it blocks in one pass and maps the names it calls to those blocks
+"""
+
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+# kind: "describe", "it" or "test"; start/end: byte span including the
+# comments just above it and the rest of its closing line; children: nested
+# blocks; literals: string literals used directly inside the block
+Block = namedtuple("Block", ["kind", "title", "start", "end", "children", "literals"])
+
+CALLS = (b"describe", b"it", b"test")
+# Comments and strings are matched whole so brackets inside them never count
+TOKEN = re.compile(
+    rb'//[^\n]*|/\*.*?\*/|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|`(?:[^`\\]|\\.)*`'
+    rb'|[A-Za-z_$][\w$]*|[()\[\]{}]',
+    re.DOTALL,
+)
+COMMENT_ONLY = re.compile(rb'(?:\s|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+LINE_TAIL = re.compile(rb'[ \t]*;?[ \t]*\n?')
+
+
+def _line_start(buf, pos):
+    """Start of pos's line if only indentation precedes it, else pos"""
+    start = buf.rfind(b"\n", 0, pos) + 1
+    return pos if buf[start:pos].strip() else start
+
+
+def scan_blocks(buf):
+    """Return (top-level blocks, file-level literals) of a spec file's bytes
+
+    One regex pass: brackets are matched on a stack, and `describe(`,
+    `it(` or `test(` directly inside a describe (or at the top level)
+    opens a block that closes with its paren.
+    """
+    # While scanning a block is [kind, start, children, literals]
+    root = ["file", 0, [], []]
+    opened = [root]
+    stack = []
+    call = None
+    for match in TOKEN.finditer(buf):
+        token = match.group()
+        first = token[:1]
+        if call is not None and token == b"(" and opened[-1][0] in ("file", "describe"):
+            block = [call[0].decode(), _line_start(buf, call[1]), [], []]
+            stack.append(block)
+            opened.append(block)
+            call = None
+            continue
+        call = None
+        if first in (b'"', b"'", b"`"):
+            opened[-1][3].append(token[1:-1].decode(errors="replace"))
+        elif first == b"/":
+            continue
+        elif first in (b"(", b"[", b"{"):
+            stack.append(None)
+        elif first in (b")", b"]", b"}"):
+            if stack and stack.pop() is not None:
+                kind, start, children, literals = opened.pop()
+                end = LINE_TAIL.match(buf, match.end()).end()
+                title = literals[0] if literals else ""
+                opened[-1][2].append(Block(kind, title, start, end, children, frozenset(literals)))
+        elif token in CALLS:
+            call = (token, match.start())
+    return _attach_comments(buf, root[2]), frozenset(root[3])
+
+
+def _attach_comments(buf, blocks):
+    """Move a comment-only gap between two blocks into the second one"""
+    out = []
+    for block in blocks:
+        block = block._replace(children=_attach_comments(buf, block.children))
+        if out and out[-1].end < block.start and COMMENT_ONLY.match(
+                buf, out[-1].end, block.start).end() == block.start:
+            block = block._replace(start=out[-1].end)
+        out.append(block)
+    return out
+
+
+class SpecIndex:
+    """The leaf test blocks of one spec file and an inverted index over them
+
+    A leaf is an it/test block, or a describe with no blocks inside. Every
+    byte of the file belongs to exactly one leaf or to the scaffolding that
+    is always kept (imports, helpers, describe headers, hooks), so keeping
+    every leaf reproduces the file byte for byte.
+    """
+
+    def __init__(self, buf):
+        self.buf = bytes(buf)
+        self.blocks, file_literals = scan_blocks(self.buf)
+        self.leaves = []
+        # Per leaf, the literal sets of the file and of each describe around
+        # it, outermost first; leaves of one describe share the same tuple
+        self.hints = []
+        # Per leaf, the start offsets of the describes around it
+        self.parents = []
+        # Leaf number range [first, last) under each describe, by start offset
+        self.spans = {}
+        self._number(self.blocks, (file_literals,), ())
+        self.by_name = {}
+        for number, leaf in enumerate(self.leaves):
+            for literal in leaf.literals:
+                self.by_name.setdefault(literal, []).append(number)
+
+    def _number(self, blocks, hints, parents):
+        for block in blocks:
+            if block.children:
+                first = len(self.leaves)
+                self._number(block.children, hints + (block.literals,), parents + (block.start,))
+                self.spans[block.start] = (first, len(self.leaves))
+            else:
+                self.leaves.append(block)
+                self.hints.append(hints)
+                self.parents.append(parents)
+
+    def assign(self, defined_at):
+        """Return, per leaf, the first step by which every name it uses is defined
+
+        defined_at maps a name to {scope: step}, where scope is the contract
+        defining it (None when there is only one). A leaf only counts scopes
+        it names in its own literals, its describes' or the file's; when it
+        names none, every scope counts. Leaves that use no defined name get
+        None. Each leaf's named scopes are found once, intersecting the few
+        scopes with its literal sets, and the walk then goes over the inverted
+        index, so the cost is linear in the number of (name, leaf) uses.
+        """
+        scopes = frozenset(scope for by_scope in defined_at.values() for scope in by_scope)
+        named_by_leaf = [frozenset().union(scopes & leaf.literals, *(scopes & literals for literals in hints))
+                         for leaf, hints in zip(self.leaves, self.hints)]
+        steps = [None] * len(self.leaves)
+        for name, numbers in self.by_name.items():
+            by_scope = defined_at.get(name)
+            if not by_scope:
+                continue
+            for number in numbers:
+                named = named_by_leaf[number]
+                wanted = [step for scope, step in by_scope.items() if not named or scope in named]
+                if wanted and (steps[number] is None or max(wanted) > steps[number]):
+                    steps[number] = max(wanted)
+        return steps
+
+    def segments(self):
+        """{owner: byte ranges} covering the file exactly once
+
+        owner is None for the text that is always kept, a leaf number, or
+        ("describe", start) for a describe's own text around its children.
+        """
+        owned = {}
+
+        def own(owner, start, end):
+            if start < end:
+                owned.setdefault(owner, []).append((start, end))
+
+        def walk(blocks, owner, start, end, number):
+            pos = start
+            for block in blocks:
+                own(owner, pos, block.start)
+                if block.children:
+                    walk(block.children, ("describe", block.start), block.start, block.end, number)
+                    number = self.spans[block.start][1]
+                else:
+                    own(number, block.start, block.end)
+                    number += 1
+                pos = block.end
+            own(owner, pos, end)
+
+        walk(self.blocks, None, 0, len(self.buf), 0)
+        return owned
+
+    def cuts(self, leaf_steps):
+        """{step: byte ranges of the file once that step's leaves are in}, for steps that add leaves
+
+        The kept ranges are maintained as leaves come in: each new leaf, and
+        each describe around it the first time, adds its segments by bisect
+        and merges them with their neighbours, so a step costs its own
+        segments plus a copy of the range list, not a walk of the tree.
+        """
+        by_step = {}
+        for number, step in enumerate(leaf_steps):
+            if step is not None:
+                by_step.setdefault(step, []).append(number)
+        owned = self.segments()
+        starts, ends = [], []
+
+        def keep(start, end):
+            i = bisect_left(starts, start)
+            if i and ends[i - 1] == start:
+                i -= 1
+                start = starts[i]
+                del starts[i], ends[i]
+            if i < len(starts) and starts[i] == end:
+                end = ends[i]
+                del starts[i], ends[i]
+            starts.insert(i, start)
+            ends.insert(i, end)
+
+        for start, end in owned.get(None, []):
+            keep(start, end)
+        active = set()
+        cuts = {}
+        for step in sorted(by_step):
+            for number in by_step[step]:
+                for parent in self.parents[number]:
+                    if parent not in active:
+                        active.add(parent)
+                        for start, end in owned.get(("describe", parent), []):
+                            keep(start, end)
+                for start, end in owned.get(number, []):
+                    keep(start, end)
+            cuts[step] = list(zip(starts, ends))
+        return cuts
+
+
+def spec_cuts(test_data, step_of):
+    """Spec byte ranges at each step that makes new test blocks runnable
+
+    A describe/it block lands with the last definition it calls; step_of
+    maps a definition name to the step that commits it. Returns ({step:
+    ranges}, number of blocks placed, number of blocks).
+    """
+    index = SpecIndex(test_data)
+    leaf_steps = index.assign({name: {None: step} for name, step in step_of.items()})
+    placed = len(leaf_steps) - leaf_steps.count(None)
+    return index.cuts(leaf_steps), placed, len(leaf_steps)
+
+
+def join_ranges(buf, ranges):
+    return b"".join(buf[start:end] for start, end in ranges)
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The commit tooling lives as flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True, check=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """An empty git repository with an identity configured"""
+    git(tmp_path, "init", "-q", "-b", "main")
+    git(tmp_path, "config", "user.email", "dev@example.com")
+    git(tmp_path, "config", "user.name", "dev")
+    git(tmp_path, "config", "core.fileMode", "true")
+    return tmp_path
@@ -0,0 +1,36 @@
+from clarity_scan import scan_definitions
+from clarity_sections import build_boundaries
+
+SOURCE = """;; Storage
+
+(define-map
+  listings
+  { id: uint }
+  { seller: principal })
+
+;; Read a listing
+(define-read-only
+  (get-listing (id uint))
+  (map-get? listings { id: id }))
+(define-constant ERR_NOT_FOUND (err u404))
+"""
+
+
+def test_names_on_the_next_line_are_found():
+    boundaries = build_boundaries(SOURCE.splitlines(keepends=True))
+    assert [(b.kind, b.name, b.start, b.end) for b in boundaries] == [
+        ("section", "", 0, 2),
+        ("define-map", "listings", 2, 7),
+        ("define-read-only", "get-listing", 7, 11),
+        ("define-constant", "ERR_NOT_FOUND", 11, 12),
+    ]
+
+
+def test_names_match_the_paren_aware_scanner():
+    names = [b.name for b in build_boundaries(SOURCE.splitlines(keepends=True)) if b.name]
+    assert names == [d.name for d in scan_definitions(SOURCE.encode())]
+
+
+def test_a_form_without_a_name_does_not_crash():
+    boundaries = build_boundaries(["(define-map\n", "\n", ";; no name\n"])
+    assert [(b.kind, b.name) for b in boundaries] == [("define-map", "")]
@@ -0,0 +1,43 @@
+from clarity_validate import validate_prefixes
+
+NAMES = {"total-volume", "score", "get-score"}
+
+
+def problems(source, names=NAMES):
+    """Problems of the prefix after each top-level form, as the generators cut one per definition"""
+    buf = source.encode()
+    ends = [i + 1 for i in range(len(buf)) if buf[i:i + 2] == b"\n(" or i == len(buf) - 1]
+    return [(problem.kind, problem.detail) for _, problem in validate_prefixes(buf, ends, names)]
+
+
+def test_parameter_sharing_a_data_var_name_is_local():
+    assert problems(
+        "(define-read-only (score (total-volume uint) (count uint))\n"
+        "  (/ total-volume count))\n"
+        "(define-data-var total-volume uint u0)\n"
+    ) == []
+
+
+def test_let_binding_sharing_a_contract_name_is_local():
+    assert problems(
+        "(define-private (get-score (id uint))\n"
+        "  (let ((total-volume (* id u2)) (score u1))\n"
+        "    (+ total-volume score)))\n"
+        "(define-data-var total-volume uint u0)\n"
+        "(define-data-var score uint u0)\n"
+    ) == []
+
+
+def test_locals_end_with_their_form():
+    assert problems(
+        "(define-read-only (get-score (total-volume uint)) total-volume)\n"
+        "(define-read-only (score) (var-get total-volume))\n"
+        "(define-data-var total-volume uint u0)\n"
+    ) == [("undefined-name", "total-volume is used before it is defined")]
+
+
+def test_forward_reference_in_a_body_is_reported():
+    assert problems(
+        "(define-public (get-score) (ok (score u1)))\n"
+        "(define-private (score (n uint)) n)\n"
+    ) == [("undefined-name", "score is used before it is defined")]
@@ -0,0 +1,117 @@
+import os
+import subprocess
+
+from conftest import git
+from git_session import GitSession
+from hunk_splitter import split_commits
+
+
+def write(repo, path, text, mode=0o644):
+    full = repo / path
+    full.parent.mkdir(parents=True, exist_ok=True)
+    full.write_text(text)
+    os.chmod(full, mode)
+
+
+def commit_all(repo, message="base"):
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+
+
+def tree(repo, rev="main"):
+    """{path: (mode, content)} of rev"""
+    entries = {}
+    for line in git(repo, "ls-tree", "-r", rev).splitlines():
+        meta, path = line.split("\t", 1)
+        mode, _, oid = meta.split()
+        entries[path] = (mode, git(repo, "cat-file", "blob", oid))
+    return entries
+
+
+def split(repo, commits):
+    with GitSession(cwd=str(repo)) as session:
+        return split_commits(commits, "main", session)
+
+
+def test_rename_with_edit_is_a_deletion_plus_a_whole_file(repo):
+    write(repo, "README-SP010.md", "# Token\n\nSome docs\n")
+    commit_all(repo)
+    git(repo, "mv", "README-SP010.md", "docs-renamed.md")
+    with open(repo / "docs-renamed.md", "a") as f:
+        f.write("One more line\n")
+
+    split(repo, [("docs: move the token readme", ["README-SP010.md", "docs-renamed.md"])])
+
+    assert tree(repo) == {"docs-renamed.md": ("100644", "# Token\n\nSome docs\nOne more line\n")}
+
+
+def test_executable_bit_survives_a_content_change(repo):
+    write(repo, "run.py", "print(1)\n", 0o755)
+    commit_all(repo)
+    write(repo, "run.py", "print(2)\n", 0o755)
+
+    split(repo, [("fix: print two", ["run.py"])])
+
+    assert tree(repo)["run.py"] == ("100755", "print(2)\n")
+
+
+def test_mode_only_change_is_committed(repo):
+    write(repo, "run.sh", "echo hi\n")
+    write(repo, "other.txt", "a\n")
+    commit_all(repo)
+    os.chmod(repo / "run.sh", 0o755)
+    write(repo, "other.txt", "b\n")
+
+    split(repo, [("chore: edit other", ["other.txt"]), ("chore: make run.sh executable", ["run.sh"])])
+
+    assert tree(repo, "main~1")["run.sh"] == ("100644", "echo hi\n")
+    assert tree(repo)["run.sh"] == ("100755", "echo hi\n")
+
+
+def test_deleted_files_are_removed(repo):
+    write(repo, "keep.txt", "keep\n")
+    write(repo, "gone.txt", "one\ntwo\n")
+    write(repo, "empty.txt", "")
+    commit_all(repo)
+    os.remove(repo / "gone.txt")
+    os.remove(repo / "empty.txt")
+
+    split(repo, [("chore: drop unused files", ["gone.txt", "empty.txt"])])
+
+    assert tree(repo) == {"keep.txt": ("100644", "keep\n")}
+
+
+def test_untracked_files_are_added_with_their_mode(repo):
+    write(repo, "keep.txt", "keep\n")
+    commit_all(repo)
+    write(repo, "tools/new.sh", "#!/bin/sh\n", 0o755)
+    write(repo, "notes.md", "notes\n")
+
+    split(repo, [("feat: add notes", ["notes.md"]), ("feat: add a tool", ["tools/new.sh"])])
+
+    assert tree(repo, "main~1") == {"keep.txt": ("100644", "keep\n"), "notes.md": ("100644", "notes\n")}
+    assert tree(repo)["tools/new.sh"] == ("100755", "#!/bin/sh\n")
+
+
+def test_hunks_follow_the_message_naming_their_definition(repo):
+    write(repo, "contracts/c.clar", "(define-data-var a uint u1)\n")
+    commit_all(repo)
+    write(repo, "contracts/c.clar", "(define-data-var a uint u1)\n(define-read-only (get-b) u2)\n"
+                                     "(define-read-only (get-c) u3)\n")
+
+    split(repo, [("feat: add get-c", ["contracts/c.clar"]), ("feat: add get-b", ["contracts/c.clar"])])
+
+    assert tree(repo, "main~1")["contracts/c.clar"][1] == ("(define-data-var a uint u1)\n"
+                                                           "(define-read-only (get-c) u3)\n")
+    assert tree(repo)["contracts/c.clar"][1] == (repo / "contracts/c.clar").read_text()
+
+
+def test_lines_break_only_on_newline(repo):
+    (repo / "notes.txt").write_bytes(b"a\n\fb\nc\r\nd\n")
+    commit_all(repo)
+    (repo / "notes.txt").write_bytes(b"a\n\fb\nc\r\nD\n")
+
+    split(repo, [("docs: capitalise d", ["notes.txt"])])
+
+    blob = subprocess.run(["git", "cat-file", "blob", "main:notes.txt"], cwd=repo, capture_output=True, check=True)
+    assert blob.stdout == b"a\n\fb\nc\r\nD\n"
@@ -0,0 +1,44 @@
+from line_edit import LineEditor
+
+
+def edit(tmp_path, text, *expressions):
+    path = tmp_path / "c.clar"
+    path.write_text(text)
+    editor = LineEditor(str(path))
+    for expression in expressions:
+        editor.apply(expression)
+    editor.save()
+    return path.read_text()
+
+
+def test_gnu_basic_regex_operators(tmp_path):
+    assert edit(tmp_path, "aaa b\nab? a|b\n",
+                r"s/a\+ b/X/", r"s/ab\?? a\|x/Y/") == "X\nY|b\n"
+
+
+def test_plus_question_and_bar_are_literal_unescaped(tmp_path):
+    assert edit(tmp_path, "a+b? c|d\n", "s/a+b? c|d/ok/") == "ok\n"
+
+
+def test_within_only_touches_the_named_definition(tmp_path):
+    source = ("(define-public (pay (price uint))\n"
+              "  (let ((fee u1))\n"
+              "    (ok fee)))\n"
+              "(define-public (refund (price uint))\n"
+              "  (let ((fee u1))\n"
+              "    (ok fee)))\n")
+    assert edit(tmp_path, source, r"within refund s|(fee u1)|(fee u2)|") == (
+        "(define-public (pay (price uint))\n"
+        "  (let ((fee u1))\n"
+        "    (ok fee)))\n"
+        "(define-public (refund (price uint))\n"
+        "  (let ((fee u2))\n"
+        "    (ok fee)))\n")
+
+
+def test_anchored_inserts_follow_earlier_inserts(tmp_path):
+    assert edit(tmp_path, "(define-constant A u1)\n(define-constant B u2)\n",
+                "after A (define-constant C u3)",
+                "after C (define-constant D u4)",
+                "before A ;; constants") == (";; constants\n(define-constant A u1)\n(define-constant C u3)\n"
+                                             "(define-constant D u4)\n(define-constant B u2)\n")